@@ -0,0 +1,85 @@
+"""On-disk cache of upload-ready image payloads.
+
+``draw_image`` and ``send_image.py batch/watch`` decode, fit, dither and
+pack every image they send. The packed payload only depends on the file
+contents and on (width, height, bw, package), so it is stored under a hash
+of those in ``output/cache/assets/<key>.<package>`` and a repeated upload
+of the same file to the same ROI skips all of that work.
+
+The directory is kept under ``max_bytes`` by evicting the least recently
+used entries (by mtime, which ``load`` refreshes on every hit).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+CACHE_DIR = Path("output/cache/assets")
+MAX_BYTES = 256 * 1024**2
+
+# (path, mtime_ns, size) -> content digest, so a batch hashes each file once
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+def file_digest(path: Path) -> str:
+    st = os.stat(path)
+    memo = (str(path), st.st_mtime_ns, st.st_size)
+    digest = _digests.get(memo)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _digests[memo] = h.hexdigest()
+    return digest
+
+
+def payload_key(path: Path, width: int, height: int, bw: bool, package: str) -> str:
+    return f"{file_digest(path)}-{width}x{height}-{'bw' if bw else 'gray'}.{package}"
+
+
+def load(key: str) -> bytes | None:
+    path = CACHE_DIR / key
+    try:
+        data = path.read_bytes()
+        os.utime(path)  # most recently used
+    except OSError:
+        return None
+    return data
+
+
+def store(key: str, data: bytes, max_bytes: int = MAX_BYTES) -> None:
+    if len(data) > max_bytes:
+        return
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = CACHE_DIR / key
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        evict(max_bytes)
+    except OSError as e:
+        print(f"[!] Couldn't cache {key}: {e}")
+
+
+def evict(max_bytes: int = MAX_BYTES) -> int:
+    """Delete least recently used entries until the cache fits; returns how many."""
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file():
+            st = entry.stat()
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Benchmarks for the rendering pipeline.
+
+    python bench.py chart [--runs 20] [--size 4x2] [--block-size 320]
+    python bench.py hot [--runs 5] [--sizes 0.5x0.5,1x1,2x2,4x2] [--save-baseline]
+
+``chart`` compares the matplotlib and the native (PIL) chart renderer.
+Every renderer runs in a fresh interpreter so import time and peak RSS
+are measured in isolation.
+
+``hot`` times the per-update hot paths: ``pack_4bit``, ``pack_1bit``, the
+/draw body encoders, ``dither_to_bw``, ``image_refit`` and ``draw_icon``
+for every size of the matrix, ``draw_image`` end to end against
+``EpdEmulator`` for every size and package mode (and once more served
+from the asset cache), and the render callback
+of every configured component (at its configured size, fed by
+``FakeHomeAssistant``) together with the /draw bytes its frame needs raw
+and in every encoding (``wire/<component>``). Results are keyed
+``case/size[/mode]`` and compared with ``bench_baseline.json``; a median
+more than ``--threshold`` slower than the baseline is a regression and
+makes the command exit with status 1.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+TZ = "America/Los_Angeles"
+DPI = 200
+BASELINE = "bench_baseline.json"
+# (bw, package) as passed to draw_image
+PACKAGE_MODES = {"gray-2ppB": (False, "2ppB"), "bw-2ppB": (True, "2ppB"), "bw-8ppB": (True, "8ppB")}
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (Linux reports KiB)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024
+
+
+def synthetic_series(n_series: int = 3, hours: int = 24, step: int = 90):
+    """Temperature-like series sampled every ``step`` seconds."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    end = time.time()
+    t = np.arange(end - hours * 3600, end, step, dtype=float)
+    out = []
+    for i in range(n_series):
+        v = 22 + i + 1.5 * np.sin(t / 86400 * 2 * np.pi + i) + rng.normal(0, 0.1, t.size)
+        out.append((f"Sensor {i}", t, v))
+    return out
+
+
+# ─────────────────────────── chart ────────────────────────────
+
+
+def chart_worker(renderer: str, runs: int, width: int, height: int) -> dict:
+    t0 = time.perf_counter()
+    from PIL import Image
+    import chart
+
+    if renderer == "matplotlib":
+        import io
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    import_s = time.perf_counter() - t0
+
+    from chart import resample_mean
+
+    raw = synthetic_series()
+
+    def render_once():
+        series = [(label, *resample_mean(t, v, step=300)) for label, t, v in raw]
+        img = Image.new("RGB", (width, height), "white")
+        if renderer == "native":
+            chart.draw_series(img, (0, 0, width, height), series, tz=TZ, dpi=DPI)
+        else:
+            fig, ax = plt.subplots(figsize=(width / DPI, height / DPI), dpi=DPI)
+            chart.plot_series(ax, series, tz=TZ)
+            buf = io.BytesIO()
+            fig.savefig(buf, format="png", dpi=DPI, transparent=True)
+            plt.close(fig)
+            buf.seek(0)
+            plot_img = Image.open(buf).convert("RGBA")
+            img.paste(plot_img, (0, 0), plot_img)
+        return img
+
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        render_once()
+        times.append(time.perf_counter() - t0)
+
+    return {
+        "renderer": renderer,
+        "import_s": import_s,
+        "first_s": times[0],
+        "median_s": statistics.median(times),
+        "max_s": max(times),
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def bench_chart(a: argparse.Namespace) -> None:
+    w_blocks, h_blocks = (float(v) for v in a.size.split("x"))
+    # same inner plot area as TimerComponent: frame margin + border + padding
+    plot_margin = 10 + 4 + 5
+    width = int(w_blocks * a.block_size) - 2 * plot_margin
+    height = int(h_blocks * a.block_size) - 2 * plot_margin
+
+    results = []
+    for renderer in ("matplotlib", "native"):
+        out = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "chart-worker",
+                renderer,
+                str(a.runs),
+                str(width),
+                str(height),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if a.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"chart {width}x{height}px, {a.runs} runs")
+    print(f"{'renderer':<12}{'import':>10}{'first':>10}{'median':>10}{'max':>10}{'RSS':>10}")
+    for r in results:
+        print(
+            f"{r['renderer']:<12}"
+            f"{r['import_s'] * 1e3:>8.0f}ms"
+            f"{r['first_s'] * 1e3:>8.0f}ms"
+            f"{r['median_s'] * 1e3:>8.1f}ms"
+            f"{r['max_s'] * 1e3:>8.1f}ms"
+            f"{r['max_rss_mb']:>8.0f}MB"
+        )
+
+
+# ─────────────────────────── hot paths ────────────────────────
+
+
+def timed(fn, runs: int) -> dict:
+    """Run ``fn`` once to warm up, then ``runs`` times; times in ms."""
+    fn()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e3)
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+        "runs": runs,
+    }
+
+
+def synthetic_photo(width: int, height: int):
+    """Grayscale gradient with noise, so dithering and packing do real work."""
+    from PIL import Image
+
+    grad = Image.linear_gradient("L").rotate(30, expand=True).resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    return Image.blend(grad, noise, 0.3).convert("RGB")
+
+
+def parse_sizes(sizes: str) -> list[tuple[str, float, float]]:
+    out = []
+    for size in sizes.split(","):
+        w, h = (float(v) for v in size.split("x"))
+        out.append((size, w, h))
+    return out
+
+
+def bench_primitives(a, results: dict) -> None:
+    from PIL import Image
+    import send_image as si
+    from epd_emulator import EpdEmulator
+
+    icon = Path("assets/lamp.svg")
+    with tempfile.TemporaryDirectory() as tmp, EpdEmulator() as dev:
+        for size, bw_, bh_ in parse_sizes(a.sizes):
+            w, h = int(bw_ * a.block_size), int(bh_ * a.block_size)
+            photo = synthetic_photo(w * 3 // 2, h * 4 // 3)  # refit has to crop and scale
+            gray = si.image_refit(photo.convert("L"), si.Dim(w, h))
+            buf = gray.tobytes()
+            canvas = Image.new("RGB", (w, h), "white")
+            results[f"pack_4bit/{size}"] = timed(lambda: si.pack_4bit(buf), a.runs)
+            results[f"pack_1bit/{size}"] = timed(lambda: si.pack_1bit(buf), a.runs)
+            packed = si.pack_4bit(buf)  # a photo: close to the worst case
+            for name, encode in si.ENCODERS.items():
+                results[f"compress_{name}/{size}"] = timed(lambda: encode(packed), a.runs)
+            results[f"dither_to_bw/{size}"] = timed(lambda: si.dither_to_bw(gray), a.runs)
+            results[f"image_refit/{size}"] = timed(
+                lambda: si.image_refit(photo.convert("L"), si.Dim(w, h)), a.runs
+            )
+            results[f"draw_icon/{size}"] = timed(
+                lambda: _draw_icon(canvas, icon, int(min(w, h) * 0.6)), a.runs
+            )
+
+            path = Path(tmp) / f"{size}.jpg"
+            photo.save(path)
+            for mode, (bw, package) in PACKAGE_MODES.items():
+                dev.reset_stats()
+                results[f"draw_image/{size}/{mode}"] = timed(
+                    lambda: si.draw_image(
+                        dev.host,
+                        path,
+                        bw=bw,
+                        package=package,
+                        clear=False,
+                        preview=False,
+                        x=0,
+                        y=0,
+                        w=w,
+                        h=h,
+                        max_usage=0.8,
+                        cache=False,
+                    ),
+                    a.runs,
+                )
+                results[f"draw_image/{size}/{mode}"]["bytes"] = dev.bytes_received // (a.runs + 1)
+                results[f"draw_image/{size}/{mode}"]["requests"] = dev.requests // (a.runs + 1)
+            # repeated upload of the same file: served from the asset cache
+            results[f"draw_image/{size}/cached"] = timed(
+                lambda: si.draw_image(
+                    dev.host,
+                    path,
+                    bw=False,
+                    package="2ppB",
+                    clear=False,
+                    preview=False,
+                    x=0,
+                    y=0,
+                    w=w,
+                    h=h,
+                    max_usage=0.8,
+                ),
+                a.runs,
+            )
+
+
+def _draw_icon(canvas, icon_path: Path, icon_size: int) -> None:
+    """BaseComponent.draw_icon without a component around it."""
+    from component import BaseComponent
+
+    stub = BaseComponent.__new__(BaseComponent)
+    stub.img = canvas
+    with contextlib.redirect_stdout(io.StringIO()):
+        stub.draw_icon(str(icon_path), x=0, y=0, icon_size=icon_size)
+
+
+def bench_components(a, results: dict) -> None:
+    """Render every configured component against a fake Home Assistant."""
+    import yaml
+
+    import const
+    from fake_ha import FakeHomeAssistant
+    from ha_load import write_secrets
+
+    conf = yaml.safe_load(Path(a.config).read_text())
+    fd, secrets_path = tempfile.mkstemp(suffix=".yaml")
+    os.close(fd)
+    with FakeHomeAssistant(conf["entities"], seed=0) as fake:
+        try:
+            write_secrets(secrets_path, fake.url, fake.token, "127.0.0.1:9")
+            const.load_config(a.config, secrets_path)
+            from ha import init_ha_states
+            from component import create_component
+
+            os.makedirs("output", exist_ok=True)
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                init_ha_states()
+                for name, c in const.CONF["components"].items():
+                    component = create_component(name)
+                    key = f"component/{name}/{c['size'][0]}x{c['size'][1]}"
+                    # time the drawing: no render cache hits, and no layout or
+                    # last frame to short-cut unchanged slots to UNCHANGED
+                    component.deterministic = False
+
+                    def cold_render(component=component):
+                        component.layout = None
+                        component.frame = None
+                        return component.render()
+
+                    try:
+                        results[key] = timed(cold_render, a.runs)
+                    except Exception as e:
+                        results[key] = {"error": str(e)}
+                        continue
+                    if component.frame is not None:
+                        results[f"wire/{name}"] = wire_sizes(component.frame)
+        finally:
+            os.unlink(secrets_path)
+
+
+def wire_sizes(frame) -> dict:
+    """/draw body bytes of one frame: raw 2ppB and in every encoding."""
+    import send_image as si
+
+    packed = si.pack_4bit(frame.convert("L").tobytes())
+    sizes = {"raw": len(packed)}
+    for name, encode in si.ENCODERS.items():
+        sizes[name] = len(encode(packed))
+    best = min(sizes.values())
+    return {"bytes": sizes, "saved": round(1 - best / sizes["raw"], 3) if packed else 0.0}
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float, min_delta_ms: float = 1.0
+) -> list[str]:
+    """Annotate results with the change against the baseline; return regressions."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key, {}).get("median_ms")
+        if base is None or "median_ms" not in r:
+            continue
+        r["baseline_ms"] = base
+        r["change"] = round(r["median_ms"] / base - 1, 3) if base else 0.0
+        # sub-millisecond cases are too noisy for a relative threshold alone
+        if r["change"] > threshold and r["median_ms"] - base > min_delta_ms:
+            regressions.append(key)
+    return regressions
+
+
+def bench_hot(a: argparse.Namespace) -> int:
+    results: dict[str, dict] = {}
+    if not a.no_components:
+        # first: ha.py copies the HA URL/token when it is first imported
+        bench_components(a, results)
+    bench_primitives(a, results)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "block_size": a.block_size,
+            "runs": a.runs,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    regressions = []
+    if a.save_baseline:
+        Path(a.baseline).write_text(json.dumps(report, indent=2) + "\n")
+    elif Path(a.baseline).exists():
+        baseline = json.loads(Path(a.baseline).read_text())["results"]
+        regressions = compare(results, baseline, a.threshold, a.min_delta_ms)
+    report["regressions"] = regressions
+
+    if a.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'case':<44}{'median':>11}{'min':>11}{'baseline':>11}{'change':>9}")
+        for key, r in results.items():
+            if "error" in r:
+                print(f"{key:<44}  error: {r['error']}")
+                continue
+            if "bytes" in r and "median_ms" not in r:
+                sizes = "  ".join(f"{k} {v / 1024:.1f}K" for k, v in r["bytes"].items())
+                print(f"{key:<44}{sizes}  (-{r['saved']:.0%})")
+                continue
+            line = f"{key:<44}{r['median_ms']:>9.1f}ms{r['min_ms']:>9.1f}ms"
+            if "baseline_ms" in r:
+                flag = "  !" if key in regressions else ""
+                line += f"{r['baseline_ms']:>9.1f}ms{r['change'] * 100:>+8.0f}%{flag}"
+            print(line)
+        if a.save_baseline:
+            print(f"Baseline saved to {a.baseline}")
+        elif regressions:
+            print(f"{len(regressions)} regression(s) over {a.threshold:.0%}: {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+# ─────────────────────────── CLI ─────────────────────────────────
+
+
+def cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="inkscreen benchmarks")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("chart", help="matplotlib vs native chart renderer")
+    c.add_argument("--runs", type=int, default=20)
+    c.add_argument("--size", default="4x2", help="component size in blocks, WxH")
+    c.add_argument("--block-size", type=int, default=320)
+    c.add_argument("--json", action="store_true", help="machine-readable output")
+
+    h = sub.add_parser("hot", help="image, upload and component hot paths")
+    h.add_argument("--runs", type=int, default=5)
+    h.add_argument("--sizes", default="0.5x0.5,1x1,2x2,4x2,4x4", help="blocks, WxH list")
+    h.add_argument("--block-size", type=int, default=320)
+    h.add_argument("--config", default="config.yaml")
+    h.add_argument("--no-components", action="store_true", help="skip component renders")
+    h.add_argument("--baseline", default=BASELINE)
+    h.add_argument("--save-baseline", action="store_true")
+    h.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    h.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore smaller slowdowns")
+    h.add_argument("--json", action="store_true", help="machine-readable output")
+
+    w = sub.add_parser("chart-worker")
+    w.add_argument("renderer", choices=["matplotlib", "native"])
+    w.add_argument("runs", type=int)
+    w.add_argument("width", type=int)
+    w.add_argument("height", type=int)
+    return p.parse_args()
+
+
+def main() -> None:
+    a = cli()
+    if a.cmd == "chart":
+        bench_chart(a)
+    elif a.cmd == "hot":
+        sys.exit(bench_hot(a))
+    elif a.cmd == "chart-worker":
+        print(json.dumps(chart_worker(a.renderer, a.runs, a.width, a.height)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Line-chart rendering for timer components.
+
+Two renderers share one input format, a list of ``(label, times, values)``
+series where ``times`` are epoch seconds and ``values`` are floats:
+
+* ``plot_series``  – the original matplotlib styling (needs matplotlib).
+* ``draw_series``  – a PIL-native renderer drawing the same chart directly
+  with ``ImageDraw``; no matplotlib import, much smaller footprint.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+Series = Tuple[str, np.ndarray, np.ndarray]
+
+LINE_STYLES = ["-", ":", "--", "-."]
+# matplotlib's default dash patterns, in units of the line width
+LINE_DASHES = {
+    "-": None,
+    ":": (1.0, 1.65),
+    "--": (3.7, 1.6),
+    "-.": (6.4, 1.6, 1.0, 1.6),
+}
+GRID_COLOR = "#e0e0e0"
+LEGEND_EDGE_COLOR = "#cccccc"
+FONT_PATH = Path("assets/arialbd.ttf")
+
+
+def resample_mean(
+    t: np.ndarray, v: np.ndarray, step: float = 300
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean-resample onto ``step``-second bins and forward-fill empty bins.
+
+    NumPy equivalent of ``df.resample("5min").mean().ffill()``.
+    """
+    mask = ~np.isnan(v)
+    t, v = t[mask], v[mask]
+    if t.size == 0:
+        return t, v
+    order = np.argsort(t)
+    t, v = t[order], v[order]
+
+    bins = np.floor(t / step).astype(np.int64)
+    bins -= bins[0]
+    n = int(bins[-1]) + 1
+    sums = np.bincount(bins, weights=v, minlength=n)
+    counts = np.bincount(bins, minlength=n)
+
+    out = np.full(n, np.nan)
+    filled = counts > 0
+    out[filled] = sums[filled] / counts[filled]
+    # forward fill: index of the last filled bin at or before each bin
+    idx = np.where(filled, np.arange(n), 0)
+    np.maximum.accumulate(idx, out=idx)
+    out = out[idx]
+
+    times = (np.floor(t[0] / step) + np.arange(n)) * step
+    return times, out
+
+
+# ───────────────────────── matplotlib renderer ─────────────────────────
+
+
+def plot_series(ax, series: Sequence[Series], tz: str) -> None:
+    """Plot series onto a matplotlib axis with Home Assistant style."""
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    for i, (label, t, v) in enumerate(series):
+        if t.size == 0:
+            continue
+        ax.plot(
+            (t * 1e6).astype("datetime64[us]"),
+            v,
+            label=label,  # 使用友好名称而非实体ID
+            color="black",
+            linewidth=3,
+            linestyle=LINE_STYLES[i % len(LINE_STYLES)],  # Cycle through styles
+        )
+
+    # Formatting the plot to look like Home Assistant
+    ax.set_xlabel("", fontsize=10)  # 移除x轴标签
+    ax.set_ylabel("°C", fontsize=10, rotation=0, labelpad=10)
+    ax.tick_params(axis="x", rotation=0, labelsize=9)
+    ax.tick_params(axis="y", labelsize=9)
+
+    # Format x-axis to show time nicely with timezone
+    local_tz = ZoneInfo(tz)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M", tz=local_tz))
+    ax.xaxis.set_major_locator(
+        mdates.HourLocator(interval=3, tz=local_tz)
+    )  # 每3小时显示一次
+
+    # Set y-axis ticks
+    y_min, y_max = ax.get_ylim()
+    ax.yaxis.set_ticks(
+        np.arange(np.floor(y_min * 4) / 4, np.ceil(y_max * 4) / 4 + 0.01, 0.5)
+    )
+
+    # Make tick labels large and bold
+    ax.tick_params(axis="both", labelsize=12)
+
+    ax.legend(fontsize=11, loc="upper right")
+
+    # Remove spines and adjust grid
+    for spine in ["top", "right"]:
+        ax.spines[spine].set_visible(False)
+    ax.spines["bottom"].set_color(GRID_COLOR)
+    ax.spines["left"].set_color(GRID_COLOR)
+
+    ax.grid(True, which="major", axis="both", linestyle="-", color=GRID_COLOR, alpha=0.7)
+
+    # 调整图表边距
+    plt.tight_layout(pad=0.5)
+
+
+# ─────────────────────────── native renderer ───────────────────────────
+
+
+def _font(size: float) -> ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.truetype(FONT_PATH, max(int(round(size)), 6))
+    except IOError:
+        print("Using default font due to error loading custom font.")
+        return ImageFont.load_default()
+
+
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font) -> Tuple[int, int]:
+    l, t, r, b = draw.textbbox((0, 0), text, font=font)
+    return r - l, b - t
+
+
+def _hour_ticks(tmin: float, tmax: float, interval: int, tz: str) -> List[float]:
+    """Epoch seconds of every local hour divisible by ``interval`` in range."""
+    zone = ZoneInfo(tz)
+    cur = datetime.fromtimestamp(tmin, zone).replace(minute=0, second=0, microsecond=0)
+    ticks = []
+    while cur.timestamp() <= tmax:
+        if cur.timestamp() >= tmin and cur.hour % interval == 0:
+            ticks.append(cur.timestamp())
+        # step in UTC so DST transitions neither repeat nor skip an hour
+        cur = (cur + timedelta(hours=1)).astimezone(zone)
+    return ticks
+
+
+def _dash_runs(
+    points: List[Tuple[float, float]], pattern: Sequence[float]
+) -> List[List[Tuple[float, float]]]:
+    """Split a polyline into the visible runs of an on/off dash pattern."""
+    runs = []
+    idx, on = 0, True
+    remaining = pattern[0]
+    cur = [points[0]]
+    for (xa, ya), (xb, yb) in zip(points, points[1:]):
+        seg = math.hypot(xb - xa, yb - ya)
+        if seg == 0:
+            continue
+        pos = 0.0
+        while seg - pos > remaining:
+            pos += remaining
+            p = (xa + (xb - xa) * pos / seg, ya + (yb - ya) * pos / seg)
+            if on:
+                cur.append(p)
+                runs.append(cur)
+            else:
+                cur = [p]
+            on = not on
+            idx = (idx + 1) % len(pattern)
+            remaining = pattern[idx]
+        remaining -= seg - pos
+        if on:
+            cur.append((xb, yb))
+    if on and len(cur) > 1:
+        runs.append(cur)
+    return runs
+
+
+def _polyline(draw, points, style: str, width: int, fill="black") -> None:
+    if len(points) < 2:
+        return
+    dashes = LINE_DASHES.get(style)
+    if dashes is None:
+        draw.line(points, fill=fill, width=width, joint="curve")
+        return
+    for run in _dash_runs(points, [d * width for d in dashes]):
+        draw.line(run, fill=fill, width=width)
+
+
+def draw_series(
+    img: Image.Image,
+    box: Tuple[int, int, int, int],
+    series: Sequence[Series],
+    tz: str,
+    dpi: int = 200,
+) -> None:
+    """Draw series into ``box`` of ``img`` with the ``plot_series`` styling.
+
+    Sizes are given in points like the matplotlib renderer and scaled by
+    ``dpi`` so both produce comparable charts for the same tile.
+    """
+    draw = ImageDraw.Draw(img)
+    x0, y0, x1, y1 = box
+    pt = dpi / 72
+    tick_font = _font(12 * pt)
+    legend_font = _font(11 * pt)
+    label_font = _font(10 * pt)
+    line_w = max(int(round(3 * pt)), 1)
+    grid_w = max(int(round(0.8 * pt)), 1)
+    tick_len = int(round(3.5 * pt))
+    pad = int(round(3.5 * pt))
+
+    data = [(label, t, v) for label, t, v in series if t.size > 0]
+    if not data:
+        return
+
+    # data limits with matplotlib's default 5% margins
+    tmin = min(float(t[0]) for _, t, _ in data)
+    tmax = max(float(t[-1]) for _, t, _ in data)
+    vmin = min(float(np.min(v)) for _, _, v in data)
+    vmax = max(float(np.max(v)) for _, _, v in data)
+    if tmax == tmin:
+        tmax = tmin + 1
+    if vmax == vmin:
+        vmin, vmax = vmin - 0.5, vmax + 0.5
+    dt, dv = tmax - tmin, vmax - vmin
+    tmin, tmax = tmin - 0.05 * dt, tmax + 0.05 * dt
+    vmin, vmax = vmin - 0.05 * dv, vmax + 0.05 * dv
+
+    yticks = np.arange(np.floor(vmin * 4) / 4, np.ceil(vmax * 4) / 4 + 0.01, 0.5)
+    vmin, vmax = min(vmin, yticks[0]), max(vmax, yticks[-1])
+    xticks = _hour_ticks(tmin, tmax, 3, tz)
+    zone = ZoneInfo(tz)
+
+    ylabels = [f"{y:.1f}" for y in yticks]
+    xlabels = [datetime.fromtimestamp(x, zone).strftime("%H:%M") for x in xticks]
+    ytick_w = max(_text_size(draw, s, tick_font)[0] for s in ylabels)
+    xtick_w = _text_size(draw, "00:00", tick_font)[0]
+    tick_h = _text_size(draw, "0123456789:", tick_font)[1]
+    unit_w, _ = _text_size(draw, "°C", label_font)
+
+    # plot area inside the box
+    left = x0 + unit_w + 2 * pad + ytick_w + tick_len
+    right = x1 - pad - xtick_w // 2
+    top = y0 + tick_h // 2 + pad
+    bottom = y1 - tick_h - 2 * pad - tick_len
+    if right - left < 10 or bottom - top < 10:
+        return
+
+    def px(t: float) -> float:
+        return left + (t - tmin) / (tmax - tmin) * (right - left)
+
+    def py(v: float) -> float:
+        return bottom - (v - vmin) / (vmax - vmin) * (bottom - top)
+
+    # grid, spines and ticks
+    for x, s in zip(xticks, xlabels):
+        X = px(x)
+        draw.line([(X, top), (X, bottom)], fill=GRID_COLOR, width=grid_w)
+        draw.line([(X, bottom), (X, bottom + tick_len)], fill="black", width=grid_w)
+        draw.text((X, bottom + tick_len + pad), s, fill="black", font=tick_font, anchor="mt")
+    for y, s in zip(yticks, ylabels):
+        Y = py(y)
+        draw.line([(left, Y), (right, Y)], fill=GRID_COLOR, width=grid_w)
+        draw.line([(left - tick_len, Y), (left, Y)], fill="black", width=grid_w)
+        draw.text((left - tick_len - pad, Y), s, fill="black", font=tick_font, anchor="rm")
+    draw.line([(left, top), (left, bottom)], fill=GRID_COLOR, width=grid_w)
+    draw.line([(left, bottom), (right, bottom)], fill=GRID_COLOR, width=grid_w)
+    draw.text((x0, (top + bottom) / 2), "°C", fill="black", font=label_font, anchor="lm")
+
+    # series
+    for i, (_, t, v) in enumerate(series):
+        if t.size == 0:
+            continue
+        points = list(zip((px(a) for a in t.tolist()), (py(b) for b in v.tolist())))
+        _polyline(draw, points, LINE_STYLES[i % len(LINE_STYLES)], line_w)
+
+    # legend, upper right
+    fs = 11 * pt
+    handle_len = int(2.0 * fs)
+    text_pad = int(0.8 * fs)
+    border = int(0.4 * fs)
+    spacing = int(0.5 * fs)
+    labels = [(i, label) for i, (label, t, _) in enumerate(series) if t.size > 0]
+    row_h = _text_size(draw, "Ag", legend_font)[1]
+    text_w = max(_text_size(draw, label, legend_font)[0] for _, label in labels)
+    lw = border * 2 + handle_len + text_pad + text_w
+    lh = border * 2 + row_h * len(labels) + spacing * (len(labels) - 1)
+    lx1, ly0 = right - pad, top + pad
+    lx0, ly1 = lx1 - lw, ly0 + lh
+    draw.rounded_rectangle(
+        [lx0, ly0, lx1, ly1], radius=int(0.2 * fs), fill="white", outline=LEGEND_EDGE_COLOR, width=grid_w
+    )
+    for row, (i, label) in enumerate(labels):
+        cy = ly0 + border + row * (row_h + spacing) + row_h / 2
+        hx = lx0 + border
+        _polyline(draw, [(hx, cy), (hx + handle_len, cy)], LINE_STYLES[i % len(LINE_STYLES)], line_w)
+        draw.text((hx + handle_len + text_pad, cy), label, fill="black", font=legend_font, anchor="lm")
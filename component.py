@@ -1,88 +1,100 @@
 from ha import *
 from typing import List, Dict, Callable
-import numpy as np, pandas as pd
 import time
 from PIL import Image, ImageDraw, ImageFont
-import os, io, cairosvg
+import os, io, threading
+from multiprocessing import shared_memory
 from pathlib import Path
-import matplotlib
 
-matplotlib.use("Agg")  # 必须在plt导入前设置
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import pytz
+import render_cache
+from damage import Rect
+from layout import Layout, Text
+from startup import lazy_import
+from profiling import profiled
+import profiling
 
-from send_image import draw_image
-from sunsethue import *
+# callback result: nothing visible changed, keep the current frame and skip the upload
+UNCHANGED = "unchanged"
+
+
+def _pyplot():
+    """Import matplotlib with the Agg backend on first use."""
+    matplotlib = lazy_import("matplotlib")
+    matplotlib.use("Agg")  # 必须在plt导入前设置
+    return lazy_import("matplotlib.pyplot")
+
+
+def load_sensor_series(eids: List[str]) -> list:
+    """Fetch history for each sensor, resampled to 5-minute means."""
+    resample_mean = lazy_import("chart").resample_mean
+    series = []
+    for eid in eids:
+        arrays = get_sensor_history_arrays(eid)
+        if arrays is None:
+            continue
+        times, values = resample_mean(*arrays, step=300)
+        if times.size == 0:
+            continue
+        entity_label = CONF["entities"].get(eid, {}).get("name", eid)
+        series.append((entity_label, times, values))
+    return series
 
 
 def plot_sensor_history(ax, eids: List[str]):
     """Fetch and plot sensor history data with Home Assistant style."""
-    # ha_color = "#336da0"
-
-    for i, eid in enumerate(eids):
-        df = get_sensor_history(eid)
-        if df is not None and not df.empty:
-            df = df.dropna(subset=["temperature"]).sort_values("time")
-
-            if not df.empty:
-                df = df.set_index("time")
-
-                df.index = df.index.tz_convert(TIMEZONE)
-
-                df_resampled = (
-                    df["temperature"].resample("5min").mean()
-                )  # Resample to 5-minute intervals
-                df_resampled = df_resampled.ffill()  # Forward-fill missing values
-                entity_label = CONF["entities"].get(eid, {}).get("name", eid)
-
-                # Define different line styles
-                line_styles = ["-", ":", "--", "-."]
-
-                # Use different line style for each entity
-                ax.plot(
-                    df_resampled.index,
-                    df_resampled.values,
-                    label=entity_label,  # 使用友好名称而非实体ID
-                    color="black",
-                    linewidth=3,
-                    linestyle=line_styles[i % len(line_styles)],  # Cycle through styles
-                )
+    lazy_import("chart").plot_series(ax, load_sensor_series(eids), tz=TIMEZONE)
+
+
+# ────────────────────── process-pool rendering ──────────────────────
+
+# components living in a render worker process, created on first use
+_process_components: Dict[str, "BaseComponent"] = {}
 
-    # Formatting the plot to look like Home Assistant
-    ax.set_xlabel("", fontsize=10)  # 移除x轴标签
-    ax.set_ylabel("°C", fontsize=10, rotation=0, labelpad=10)
-    ax.tick_params(axis="x", rotation=0, labelsize=9)
-    ax.tick_params(axis="y", labelsize=9)
 
-    # Format x-axis to show time nicely with timezone
-    local_tz = pytz.timezone("America/Los_Angeles")  # UTC-7
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M", tz=local_tz))
-    ax.xaxis.set_major_locator(
-        mdates.HourLocator(interval=3, tz=local_tz)
-    )  # 每3小时显示一次
+def init_render_worker() -> None:
+    """Process-pool initializer: leave Ctrl-C handling to the main process."""
+    import signal
 
-    # Set y-axis ticks
-    y_min, y_max = ax.get_ylim()
-    ax.yaxis.set_ticks(
-        np.arange(np.floor(y_min * 4) / 4, np.ceil(y_max * 4) / 4 + 0.01, 0.5)
-    )
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ui_settings = CONF["ui_settings"]
+    profiling.configure(ui_settings.get("profiling", False), ui_settings.get("profile_top_n", 25))
 
-    # Make tick labels large and bold
-    ax.tick_params(axis="both", labelsize=12)
 
-    ax.legend(fontsize=11, loc="upper right")
+def render_to_shared_memory(name: str) -> tuple[str, int, int] | str | None:
+    """Process-pool entry point: render ``name`` in this worker process.
 
-    # Remove spines and adjust grid
-    for spine in ["top", "right"]:
-        ax.spines[spine].set_visible(False)
-    ax.spines["bottom"].set_color("#e0e0e0")
-    ax.spines["left"].set_color("#e0e0e0")
+    The grayscale frame is written into a new shared memory block whose
+    name is returned with the frame size, so only a few bytes are pickled
+    back. The caller owns the block and must unlink it.
+    """
+    component = _process_components.get(name)
+    if component is None:
+        component = _process_components[name] = create_component(name)
+    ok = component.render()
+    if ok is False:
+        return None
+    if ok == UNCHANGED:
+        return UNCHANGED
+    frame = component.frame
+    shm = shared_memory.SharedMemory(create=True, size=frame.width * frame.height)
+    try:
+        shm.buf[: shm.size] = frame.tobytes()
+    finally:
+        shm.close()
+    return shm.name, frame.width, frame.height
 
-    ax.grid(True, which="major", axis="both", linestyle="-", color="#e0e0e0", alpha=0.7)
 
-    # 调整图表边距
-    plt.tight_layout(pad=0.5)
+def frame_from_shared_memory(shm_name: str, width: int, height: int) -> Image.Image:
+    """Copy a frame out of a block from ``render_to_shared_memory`` and free it."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        view = Image.frombuffer("L", (width, height), shm.buf, "raw", "L", 0, 1)
+        frame = view.copy()
+        del view  # release the buffer export before closing
+    finally:
+        shm.close()
+        shm.unlink()
+    return frame
 
 
 def create_component(
@@ -101,6 +113,11 @@ def create_component(
 
 
 class BaseComponent:
+    # output depends only on config and asset files: eligible for the render cache
+    deterministic = False
+    # files read while drawing besides those named in params (fonts, ...)
+    render_assets: tuple[str, ...] = ()
+
     def __init__(
         self,
         name: str,
@@ -123,40 +140,115 @@ class BaseComponent:
         self.height_px = int(self.H * self.block_size)
 
         self.params = self.component_conf.get("params", {})
+        # where render() runs: "thread" (render pool), "process" or "inline"
+        self.executor = self.component_conf.get("executor", "thread")
+        # refresh budget: high | normal | low, and min seconds between panel updates
+        self.priority = self.component_conf.get("priority", "normal")
+        self.min_refresh_interval = self.component_conf.get(
+            "min_refresh_interval", CONF["ui_settings"].get("min_refresh_interval", 0)
+        )
+        # latest rendered grayscale image, as it should appear on the panel
+        self.frame: Image.Image | None = None
+        # version of the inputs self.frame was drawn from (see input_seq)
+        self.frame_seq: int | None = None
+        # areas that changed since the frame was last composed (None: all of it)
+        self.damage: list[Rect] | None = None
+        # set by draw_layout during a render: the slots it redrew
+        self.changed_rects: list[Rect] | None = None
+        self.layout: Layout | None = None
+        # held while drawing self.img and writing output/<name>.jpg
+        self._lock = threading.Lock()
+        self.deterministic = self.component_conf.get("deterministic", self.deterministic)
+        if not CONF["ui_settings"].get("render_cache", True):
+            self.deterministic = False
 
         img = Image.new("RGB", (self.width_px, self.height_px), "white")
         self.img = img
         draw = ImageDraw.Draw(img)
         self.draw = draw
 
-    def callback(self):
-        self.callback_func()
-        if SECRETS["inkscreen"].get("enable", True):
-            self.render_to_inkscreen()
-
-    def render_to_inkscreen(self) -> bool:
-        """Render the component to an image file."""
-        print(
-            f"[{datetime.now():%H:%M:%S}] Rendering {self.name} to ink screen at ({self.x_px}, {self.y_px}) with size {self.width_px}x{self.height_px}"
-        )
-        try:
-            draw_image(
-                host=SECRETS["inkscreen"]["host"],
-                path=Path(f"output/{self.name}.jpg"),
-                bw=False,
-                preview=False,
-                x=self.x_px,
-                y=self.y_px,
-                w=self.width_px,
-                h=self.height_px,
-                clear=False,
-                package="2ppB",
-                max_usage=0.8,  # PSRAM usage threshold
-            )
-            return True
-        except Exception as e:
-            print(f"Error rendering {self.name}: {e}")
+    def input_seq(self) -> int | None:
+        """Current version of the state this component draws (None: unversioned)."""
+        return None
+
+    def freeze_inputs(self) -> int | None:
+        """Take a consistent snapshot of the inputs for one render; returns its version."""
+        return None
+
+    @property
+    def stale(self) -> bool:
+        """Newer inputs arrived since self.frame was drawn."""
+        seq = self.input_seq()
+        return seq is not None and seq != self.frame_seq
+
+    @profiled(lambda self: self.name)
+    def render(self) -> bool:
+        """Redraw the component image without uploading it."""
+        with self._lock:
+            key = self.render_key() if self.deterministic else None
+            if key is not None:
+                frame = render_cache.load(key, self.width_px, self.height_px)
+                if frame is not None:
+                    self.frame = frame
+                    self.add_damage(None)
+                    return True
+            seq = self.freeze_inputs()
+            self.changed_rects = None
+            ok = self.callback_func()
+            if ok is not False and ok != UNCHANGED:
+                self.frame = self.img.convert("L")
+                if key is not None:
+                    self.frame = render_cache.store(key, self.frame)
+                self.add_damage(self.changed_rects)
+            if ok is not False:
+                self.frame_seq = seq
+            return ok
+
+    def add_damage(self, rects: list[Rect] | None) -> None:
+        """Record what a new frame changed; None means the whole tile."""
+        if rects is None:
+            self.damage = None
+        elif self.damage is not None:
+            self.damage.extend(rects)
+
+    def take_damage(self) -> list[Rect] | None:
+        """What changed since the last call, in tile coordinates (None: everything)."""
+        damage, self.damage = self.damage, []
+        return damage
+
+    def draw_layout(self, key, background: Callable, slots: dict[str, Text]) -> bool | str:
+        """Draw self.img as a cached background plus text slots (see layout.py).
+
+        ``background(img, draw)`` only runs when ``key`` changes. Returns
+        UNCHANGED when every slot still shows what the current frame shows.
+        """
+        if self.layout is None:
+            self.layout = Layout(self.img.size, self.img.mode)
+        self.changed_rects = self.layout.render(self.img, key, background, slots)
+        if self.changed_rects == [] and self.frame is not None:
+            return UNCHANGED
+        return True
+
+    def save_render(self) -> bool:
+        """Write output/<name>.jpg unless ``ui_settings.save_renders`` is off.
+
+        Returns whether the file was written. The composed panel is in
+        output/panel-<display>.fb (see framebuffer.py).
+        """
+        if not CONF["ui_settings"].get("save_renders", True):
             return False
+        self.img.save(f"output/{self.name}.jpg")
+        return True
+
+    def render_key(self) -> str:
+        """Content hash of everything a deterministic render depends on."""
+        conf = {
+            "class": type(self).__name__,
+            "callback": self.component_conf.get("callback"),
+            "size": [self.width_px, self.height_px],
+            "params": self.params,
+        }
+        return render_cache.content_key(conf, self.render_assets)
 
     def _draw_rounded_rectangle(
         self, draw, coords, radius, fill=None, outline=None, width=1
@@ -270,11 +362,18 @@ class BaseComponent:
             return Image.eval(icon, lambda x: 255 - x)
 
     def draw_icon(
-        self, icon_path: str, x: int, y: int, icon_size: float, invert: bool = False
+        self,
+        icon_path: str,
+        x: int,
+        y: int,
+        icon_size: float,
+        invert: bool = False,
+        img: Image.Image | None = None,
     ) -> Image.Image:
-        """绘制图标到组件"""
+        """绘制图标到组件 (or into ``img``, e.g. a layout background)"""
 
         try:
+            cairosvg = lazy_import("cairosvg")
             png_data = cairosvg.svg2png(
                 url=icon_path, output_width=icon_size, output_height=icon_size
             )
@@ -284,7 +383,7 @@ class BaseComponent:
                 icon = self._invert_icon(icon)
 
             # print(icon_x, icon_y)
-            self.img.paste(icon, (x, y), icon)
+            (self.img if img is None else img).paste(icon, (x, y), icon)
         except Exception as e:
             print("Error loading icon:", e)
 
@@ -321,15 +420,29 @@ class HAComponent(BaseComponent):
     ):
         super().__init__(name)
         self.entity_id = self.component_conf["entity_id"]
+        # a snapshot of the entity, refreshed at the start of every render
         self.entity = ha_states.get(self.entity_id, None)
+        if self.executor == "process":
+            # entity state lives in the main process
+            print(f"[!] {name}: executor 'process' not supported for ha_event, using thread")
+            self.executor = "thread"
         self._default_callback_func = self.default_ha_callback
         self.hook_callback_func()
 
+    def input_seq(self) -> int | None:
+        entity = ha_states.get(self.entity_id)
+        return None if entity is None else entity.seq
+
+    def freeze_inputs(self) -> int | None:
+        entity = ha_states.get(self.entity_id)
+        if entity is None:
+            return None
+        self.entity = entity.snapshot()
+        return self.entity.seq
+
     def default_ha_callback(self) -> bool:
-        fg_color, bg_color = (
-            ("black", "white") if self.entity.normal else ("white", "black")
-        )
-        self.draw_frame(self.draw, bg_color=bg_color)
+        normal = self.entity.normal
+        fg_color, bg_color = ("black", "white") if normal else ("white", "black")
 
         render_state_text = self.params.get("render_state_text", True)
         if render_state_text:
@@ -341,15 +454,19 @@ class HAComponent(BaseComponent):
             icon_x = int(self.width_px / 2 - icon_size / 2)
             icon_y = int(self.height_px / 2 - icon_size / 2)
 
-        # Draw the icon
-        self.draw_icon(
-            self.params.get("icon", "assets/lamp.svg"),
-            x=icon_x,
-            y=icon_y,
-            icon_size=icon_size,
-            invert=not self.entity.normal,
-        )
+        def background(img, draw):
+            # frame and icon only change with normal / abnormal
+            self.draw_frame(draw, bg_color=bg_color)
+            self.draw_icon(
+                self.params.get("icon", "assets/lamp.svg"),
+                x=icon_x,
+                y=icon_y,
+                icon_size=icon_size,
+                invert=not normal,
+                img=img,
+            )
 
+        slots = {}
         if render_state_text:
             try:
                 font_size = int(min(max(12, self.height_px / 5.5), 80))
@@ -358,22 +475,22 @@ class HAComponent(BaseComponent):
                 print("Using default font due to error loading custom font.")
                 font = ImageFont.load_default()
 
-            state_text = self.entity.state_name
-            self.draw.text(
+            slots["state"] = Text(
                 (self.width_px // 2, self.height_px * 4 // 5),
-                state_text,
+                self.entity.state_name,
+                font,
                 fill=fg_color,
-                font=font,
                 anchor="mm",
             )
+        result = self.draw_layout(normal, background, slots)
 
         try:
             output_path = f"output/{self.name}.jpg"
-            self.img.save(output_path)
-            print(
-                f"[{datetime.now().strftime('%H:%M:%S')}] {self.name} rendered to {output_path}"
-            )
-            return True
+            if self.save_render():
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] {self.name} rendered to {output_path}"
+                )
+            return result
         except Exception as e:
             print(f"[!] Error rendering entity {self.entity_id}: {e}")
             return False
@@ -387,6 +504,13 @@ class TimerComponent(BaseComponent):
         super().__init__(name)
 
         self.refresh_interval = self.component_conf["refresh_interval"]
+        # run on wall-clock multiples of refresh_interval (+ align_offset)
+        self.align = self.component_conf.get("align", False)
+        self.align_offset = self.component_conf.get("align_offset", 0)
+        # set by a callback: epoch of one extra refresh before the next interval
+        self.refresh_at: float | None = None
+        # "matplotlib" (default) or "native" (PIL-only line chart)
+        self.renderer = self.component_conf.get("renderer", "matplotlib")
         self._default_callback_func = self.default_timer_callback
         self.hook_callback_func()
 
@@ -403,31 +527,46 @@ class TimerComponent(BaseComponent):
             border_width = 4
             plot_margin = margin + border_width + 5  # Extra padding for plot
 
-            # Create the matplotlib plot with adjusted size to fit inside the frame
             plot_width = width - (2 * plot_margin)
             plot_height = height - (2 * plot_margin)
-            fig, ax = plt.subplots(
-                figsize=(plot_width / DPI, plot_height / DPI), dpi=DPI
-            )
-            plot_sensor_history(ax, self.params["entities"])
-
-            # Save the plot to a temporary buffer
-            buf = io.BytesIO()
-            fig.savefig(buf, format="png", dpi=DPI, transparent=True)
-            plt.close(fig)
-            buf.seek(0)
-
-            # Open the plot image and paste it onto our framed image
-            plot_img = Image.open(buf).convert("RGBA")
-            self.img.paste(
-                plot_img, (plot_margin, plot_margin), plot_img.convert("RGBA")
-            )
+            if self.renderer == "native":
+                lazy_import("chart").draw_series(
+                    self.img,
+                    (
+                        plot_margin,
+                        plot_margin,
+                        plot_margin + plot_width,
+                        plot_margin + plot_height,
+                    ),
+                    load_sensor_series(self.params["entities"]),
+                    tz=TIMEZONE,
+                    dpi=DPI,
+                )
+            else:
+                # Create the matplotlib plot with adjusted size to fit inside the frame
+                plt = _pyplot()
+                fig, ax = plt.subplots(
+                    figsize=(plot_width / DPI, plot_height / DPI), dpi=DPI
+                )
+                plot_sensor_history(ax, self.params["entities"])
+
+                # Save the plot to a temporary buffer
+                buf = io.BytesIO()
+                fig.savefig(buf, format="png", dpi=DPI, transparent=True)
+                plt.close(fig)
+                buf.seek(0)
+
+                # Open the plot image and paste it onto our framed image
+                plot_img = Image.open(buf).convert("RGBA")
+                self.img.paste(
+                    plot_img, (plot_margin, plot_margin), plot_img.convert("RGBA")
+                )
 
             # Save the final image
-            self.img.save(f"output/{self.name}.jpg")
-            print(
-                f"[{datetime.now().strftime('%H:%M:%S')}] {self.name}: Chart saved to output/{self.name}.jpg"
-            )
+            if self.save_render():
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] {self.name}: Chart saved to output/{self.name}.jpg"
+                )
             return True
         except Exception as e:
             print(f"[!] {self.name}: Chart rendering error: {e}")
@@ -437,8 +576,24 @@ class TimerComponent(BaseComponent):
         """Render the sunset hue forecast."""
 
         try:
-            weather_data = get_weather_forecast()
-            weather_report = format_forecast_data(weather_data)
+            sunsethue = lazy_import("sunsethue")
+            fallback = self.params.get("fallback_event_time", sunsethue.FALLBACK_EVENT_TIME)
+            day, weather_data = sunsethue.current_forecast(
+                ttl=self.params.get("cache_ttl", sunsethue.CACHE_TTL),
+                timeout=self.params.get("timeout", sunsethue.TIMEOUT),
+                fallback=fallback,
+            )
+            # switch to tomorrow's forecast as soon as today's event is over
+            switch = sunsethue.switch_time(weather_data, fallback).timestamp()
+            self.refresh_at = switch if switch > time.time() else None
+            weather_report = sunsethue.format_forecast_data(weather_data)
+            if weather_report is None:
+                print(f"[!] {self.name}: no sunset forecast available")
+                return False
+            # same numbers as on the panel: nothing to redraw
+            if (day, weather_report) == getattr(self, "_forecast_shown", None) and self.frame:
+                return UNCHANGED
+            is_today = day == datetime.now(ZoneInfo(TIMEZONE)).strftime("%Y-%m-%d")
             quality = weather_report.get("quality", "No data")
             quality_text = weather_report.get("quality_text", "No data")
             golden_hour_str = weather_report.get("golden_hour", "No data")
@@ -449,87 +604,61 @@ class TimerComponent(BaseComponent):
             percent_font = self._get_font(108)
             text_font = self._get_font(50)
 
-            # Background color based on quality
-            self.draw_frame(self.draw, bg_color="white")
-
-            # Draw the "Sunset" title
-            self.draw.text((40, 30), "Sunset", fill="black", font=title_font)
-
-            # Draw the golden hour time with icon
             D = 340
             W_ICON_TEXT = 90
             ICON_SIZE = 80
-            sunset_icon_x = self.width_px - D
-            sunset_icon_y = 30
             H_ICON_TEXT = 20
-            self.draw_icon(
-                icon_path=kwargs.get("icon_golden", "assets/sun.svg"),
-                x=sunset_icon_x,
-                y=sunset_icon_y,
-                icon_size=ICON_SIZE,
-                invert=False,
-            )
-            self.draw.text(
-                (sunset_icon_x + W_ICON_TEXT, sunset_icon_y + H_ICON_TEXT),
-                golden_hour_str,
-                fill="black",
-                font=text_font,
-            )
-
-            # Draw the blue hour time with icon
-            blue_icon_x = self.width_px - D
-            blue_icon_y = 130
-            self.draw_icon(
-                icon_path=kwargs.get("icon_blue", "assets/sunset.svg"),
-                x=blue_icon_x,
-                y=blue_icon_y,
-                icon_size=ICON_SIZE,
-                invert=False,
-            )
-            self.draw.text(
-                (blue_icon_x + W_ICON_TEXT, blue_icon_y + H_ICON_TEXT),
-                blue_hour_str,
-                fill="black",
-                font=text_font,
-            )
-
-            # Draw the quality percentage
-            self.draw.text(
-                (30, 115), f"{int(quality*100)}%", fill="black", font=percent_font
-            )
-
-            # Draw the quality text below percentage
-            self.draw.text((40, 230), quality_text, fill="black", font=title_font)
-
-            # Draw cloud cover with icon
-            cloud_icon_x = self.width_px - D
-            cloud_icon_y = 230
-            self.draw_icon(
-                icon_path=kwargs.get("icon_cloud", "assets/cloud.svg"),
-                x=cloud_icon_x,
-                y=cloud_icon_y,
-                icon_size=ICON_SIZE,
-                invert=False,
-            )
-            self.draw.text(
-                (cloud_icon_x + W_ICON_TEXT, cloud_icon_y + H_ICON_TEXT),
-                f"{int(cloud_cover*100)}%",
-                fill="black",
-                font=text_font,
+            icon_x = self.width_px - D
+            # golden hour, blue hour and cloud cover rows: (icon, y)
+            rows = [
+                (kwargs.get("icon_golden", "assets/sun.svg"), 30),
+                (kwargs.get("icon_blue", "assets/sunset.svg"), 130),
+                (kwargs.get("icon_cloud", "assets/cloud.svg"), 230),
+            ]
+
+            def background(img, draw):
+                # frame and the three icons never change
+                self.draw_frame(draw, bg_color="white")
+                for icon_path, y in rows:
+                    self.draw_icon(
+                        icon_path=icon_path,
+                        x=icon_x,
+                        y=y,
+                        icon_size=ICON_SIZE,
+                        invert=False,
+                        img=img,
+                    )
+
+            row_text = lambda i, text: Text(
+                (icon_x + W_ICON_TEXT, rows[i][1] + H_ICON_TEXT), text, text_font
             )
+            slots = {
+                # "Sunset", or tomorrow's forecast after today's sunset
+                "title": Text((40, 30), "Sunset" if is_today else "Tomorrow", title_font),
+                "golden_hour": row_text(0, golden_hour_str),
+                "blue_hour": row_text(1, blue_hour_str),
+                "quality": Text((30, 115), f"{int(quality*100)}%", percent_font),
+                "quality_text": Text((40, 230), quality_text, title_font),
+                "cloud_cover": row_text(2, f"{int(cloud_cover*100)}%"),
+            }
+            result = self.draw_layout(tuple(rows), background, slots)
 
             # Save the image
-            self.img.save(f"output/{self.name}.jpg")
-            print(
-                f"[{datetime.now().strftime('%H:%M:%S')}] {self.name}: Sunset forecast saved to output/{self.name}.jpg"
-            )
-            return True
+            if self.save_render():
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] {self.name}: Sunset forecast saved to output/{self.name}.jpg"
+                )
+            self._forecast_shown = (day, weather_report)
+            return result
         except Exception as e:
             print(f"[!] {self.name}: Sunset forecast rendering error: {e}")
             return False
 
 
 class NotebookComponent(BaseComponent):
+    deterministic = True
+    render_assets = ("assets/consolab.ttf",)
+
     def __init__(self, name: str):
         super().__init__(name)
         self.component_type = "notebook"
@@ -562,10 +691,10 @@ class NotebookComponent(BaseComponent):
         #
         try:
             output_path = f"output/{self.name}.jpg"
-            self.img.save(output_path)
-            print(
-                f"[{datetime.now().strftime('%H:%M:%S')}] {self.name} rendered to {output_path}"
-            )
+            if self.save_render():
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] {self.name} rendered to {output_path}"
+                )
             return True
         except Exception as e:
             print(f"[!] Error rendering notebook {self.name}: {e}")
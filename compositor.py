@@ -0,0 +1,175 @@
+"""Full-panel compositor.
+
+Components render into their own images; the compositor pastes the
+grayscale frames into one in-memory framebuffer laid out from each
+component's ``position``/``size`` and ``ui_settings.block_size``, and
+records the damage on the layout grid. ``flush`` pushes the merged dirty
+regions to the panel in a single pass that shares one device probe.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from PIL import Image
+
+import metrics
+from damage import DamageTracker, Rect, grid_cell
+from framebuffer import SharedFramebuffer
+from profiling import profiled
+from send_image import packing, probe, upload_image
+
+
+class Compositor:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        cell: int = 1,
+        package: str = "2ppB",
+        max_usage: float = 0.8,
+        request_overhead_px: int = 100_000,
+        compressed: bool = True,
+        shared: str | Path | None = None,
+    ):
+        self.width = width
+        self.height = height
+        self.package = package
+        self.max_usage = max_usage
+        self.compressed = compressed
+        self.framebuffer = Image.new("L", (width, height), 255)
+        # mirror of the framebuffer that other processes can map
+        self.shared = SharedFramebuffer(shared, self.framebuffer) if shared else None
+        self.damage = DamageTracker(cell, request_overhead_px)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_components(cls, components: Iterable, **kw) -> "Compositor":
+        """Size the framebuffer and damage grid from the component layout."""
+        components = list(components)
+        width = max((c.x_px + c.width_px for c in components), default=0)
+        height = max((c.y_px + c.height_px for c in components), default=0)
+        return cls(width, height, cell=grid_cell(components), **kw)
+
+    def relayout(self, components: Iterable) -> None:
+        """Adopt a changed layout; the framebuffer only grows.
+
+        Areas outside the new layout still exist on the panel, so the
+        framebuffer keeps covering them (e.g. to clear a removed tile).
+        """
+        components = list(components)
+        width = max([self.width] + [c.x_px + c.width_px for c in components])
+        height = max([self.height] + [c.y_px + c.height_px for c in components])
+        cell = math.gcd(self.damage.cell, grid_cell(components))
+        with self._lock:
+            if (width, height) != (self.width, self.height):
+                framebuffer = Image.new("L", (width, height), 255)
+                framebuffer.paste(self.framebuffer, (0, 0))
+                self.framebuffer, self.width, self.height = framebuffer, width, height
+                if self.shared is not None:
+                    self.shared.resize(framebuffer)
+            if cell != self.damage.cell:
+                old = self.damage.cell
+                dirty = [Rect(cx * old, cy * old, old, old) for cx, cy in self.damage.cells]
+                self.damage.cell = cell
+                self.damage.clear()
+                for rect in dirty:
+                    self.damage.add(rect)
+
+    def paste(
+        self, x: int, y: int, frame: Image.Image, dirty: bool | Iterable[Rect] = True
+    ) -> Rect:
+        """Place a component frame at (x, y) and mark its rectangle dirty.
+
+        ``dirty=False`` for a frame the panel already shows, or the panel
+        rectangles that actually changed (layout slots).
+        """
+        rect = Rect(x, y, frame.width, frame.height)
+        frame = frame.convert("L")
+        with self._lock:
+            self.framebuffer.paste(frame, (x, y))
+            if self.shared is not None:
+                self.shared.write(x, y, frame)
+            if dirty is True:
+                self.damage.add(rect)
+            elif dirty:
+                for r in dirty:
+                    if r.w > 0 and r.h > 0:
+                        self.damage.add(r)
+        return rect
+
+    def clear(self, rect: Rect) -> None:
+        """Blank a rectangle (e.g. a removed tile) and mark it dirty."""
+        with self._lock:
+            self.framebuffer.paste(255, (rect.x, rect.y, rect.x2, rect.y2))
+            if self.shared is not None:
+                self.shared.write(rect.x, rect.y, Image.new("L", (rect.w, rect.h), 255))
+            self.damage.add(rect)
+
+    def invalidate(self) -> None:
+        """Mark the whole framebuffer dirty (repaint after a panel clear)."""
+        with self._lock:
+            self.damage.add(Rect(0, 0, self.width, self.height))
+
+    def take_regions(self, hold: Iterable[Rect] = ()) -> list[tuple[Rect, Image.Image]]:
+        """Pop the merged dirty regions together with a snapshot of each.
+
+        Cells of the ``hold`` rectangles stay dirty for a later flush.
+        """
+        with self._lock:
+            held = set()
+            for rect in hold:
+                held |= self.damage.cells_of(rect)
+            held &= self.damage.cells
+            self.damage.cells -= held
+            regions = self.damage.regions(avoid=held)
+            self.damage.cells = held
+            return [
+                (r, self.framebuffer.crop((r.x, r.y, r.x2, r.y2))) for r in regions
+            ]
+
+    @profiled("upload")
+    def flush(self, host: str, hold: Iterable[Rect] = ()) -> int:
+        """Upload all dirty regions but ``hold`` in one pass; returns the patch count."""
+        regions = self.take_regions(hold)
+        if not regions:
+            return 0
+        try:
+            with metrics.span("upload") as span:
+                patches = self._upload(host, regions)
+                span.patches = patches
+        except Exception:
+            # keep the regions dirty so the next flush retries them
+            with self._lock:
+                for rect, _ in regions:
+                    self.damage.add(rect)
+            raise
+        print(
+            f"[{datetime.now():%H:%M:%S}] Panel updated: {len(regions)} region(s), {patches} patch(es)"
+        )
+        return patches
+
+    def _upload(self, host: str, regions: list[tuple[Rect, Image.Image]]) -> int:
+        info, free = probe(host)
+        # what one /draw can carry, for the next merge decision
+        self.damage.patch_px = int(free * self.max_usage / packing(False, self.package)[1])
+        patches = 0
+        for rect, img in regions:
+            patches += upload_image(
+                host,
+                img,
+                x=rect.x,
+                y=rect.y,
+                bw=False,
+                package=self.package,
+                clear=False,
+                max_usage=self.max_usage,
+                info=info,
+                free=free,
+                compressed=self.compressed,
+            )
+        return patches
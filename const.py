@@ -1,18 +1,70 @@
+"""Settings from config.yaml and secrets.yaml as module constants.
+
+The files are read when this module is first imported. ``ha_load.py`` and
+``bench.py`` run without a real secrets.yaml: they call ``load_config``
+with their own files before importing ``ha``, i.e. before anything
+star-imports the constants.
+"""
+
 from pathlib import Path
 import yaml
 
-CONF = yaml.safe_load(Path("config.yaml").read_text())
-SECRETS = yaml.safe_load(Path("secrets.yaml").read_text())
-TOKEN = SECRETS["homeassistant"]["token"]
-BASE_URL = SECRETS["homeassistant"]["url"].rstrip("/")
-REST_URL = f"{BASE_URL}/api"
-WS_URL = (
-    BASE_URL.replace("http://", "ws://").replace("https://", "wss://")
-    + "/api/websocket"
-)
-CONF_ENTITIES = CONF["entities"]
-TIMEZONE = CONF["locale"].get("timezone", "America/Los_Angeles")
-WATCHED = CONF_ENTITIES.keys()
-SUNSETHUE_API_KEY = SECRETS["sunsethue"]["api_key"]
-SUNSETHUE_LATITUDE = SECRETS["sunsethue"]["latitude"]
-SUNSETHUE_LONGITUDE = SECRETS["sunsethue"]["longitude"]
+
+def load_config(config_path="config.yaml", secrets_path="secrets.yaml") -> dict:
+    """Read config.yaml and secrets.yaml and publish the module constants."""
+    global _config_path
+    _config_path = Path(config_path)
+    conf = yaml.safe_load(Path(config_path).read_text())
+    secrets = yaml.safe_load(Path(secrets_path).read_text())
+    base_url = secrets["homeassistant"]["url"].rstrip("/")
+    values = {
+        "CONF": conf,
+        "SECRETS": secrets,
+        "TOKEN": secrets["homeassistant"]["token"],
+        "BASE_URL": base_url,
+        "REST_URL": f"{base_url}/api",
+        "WS_URL": (
+            base_url.replace("http://", "ws://").replace("https://", "wss://")
+            + "/api/websocket"
+        ),
+        "CONF_ENTITIES": conf["entities"],
+        "TIMEZONE": conf["locale"].get("timezone", "America/Los_Angeles"),
+        "WATCHED": conf["entities"].keys(),
+        "SUNSETHUE_API_KEY": secrets["sunsethue"]["api_key"],
+        "SUNSETHUE_LATITUDE": secrets["sunsethue"]["latitude"],
+        "SUNSETHUE_LONGITUDE": secrets["sunsethue"]["longitude"],
+    }
+    globals().update(values)
+    return values
+
+
+def update_config(conf: dict) -> None:
+    """Apply a re-read config.yaml to the loaded constants in place.
+
+    Other modules hold ``CONF``, ``CONF_ENTITIES`` and ``WATCHED`` (and
+    sections such as ``CONF["ui_settings"]``) through ``from const import *``,
+    so the existing dicts are updated instead of replaced.
+    """
+    current = globals().get("CONF") or load_config()["CONF"]
+    for key in [k for k in current if k not in conf]:
+        del current[key]
+    for key, value in conf.items():
+        old = current.get(key)
+        if old is value:
+            continue
+        if isinstance(old, dict) and isinstance(value, dict):
+            old.clear()
+            old.update(value)
+        else:
+            current[key] = value
+
+
+def config_path() -> Path:
+    """The config.yaml the constants were loaded from."""
+    return globals().get("_config_path") or Path("config.yaml")
+
+
+try:
+    load_config()
+except FileNotFoundError:
+    pass  # harness without secrets.yaml: it calls load_config() itself
@@ -0,0 +1,153 @@
+"""Damage tracking on the layout grid.
+
+Dirty areas are recorded as cells of the layout grid (the largest cell
+size that every component's position and size is a multiple of, e.g.
+160 px for 0.5-block tiles at block_size 320). ``regions`` turns the dirty
+cells into a small set of upload rectangles: runs of cells become
+rectangles, then rectangles are merged greedily while a merge lowers
+
+    cost = requests * request_overhead_px + uploaded pixels
+
+i.e. while one more ``/draw`` round trip (and panel refresh) costs more
+than the white space a merged rectangle re-sends.
+"""
+
+from __future__ import annotations
+
+import math
+from functools import reduce
+from typing import Iterable, NamedTuple
+
+
+class Rect(NamedTuple):
+    x: int
+    y: int
+    w: int
+    h: int
+
+    @property
+    def x2(self) -> int:
+        return self.x + self.w
+
+    @property
+    def y2(self) -> int:
+        return self.y + self.h
+
+    def union(self, other: "Rect") -> "Rect":
+        x, y = min(self.x, other.x), min(self.y, other.y)
+        return Rect(x, y, max(self.x2, other.x2) - x, max(self.y2, other.y2) - y)
+
+
+def grid_cell(components: Iterable) -> int:
+    """Largest pixel cell that all component rectangles snap to."""
+    values = []
+    for c in components:
+        values += [c.x_px, c.y_px, c.width_px, c.height_px]
+    cell = reduce(math.gcd, (v for v in values if v), 0)
+    return cell or 1
+
+
+class DamageTracker:
+    def __init__(
+        self,
+        cell: int,
+        request_overhead_px: int = 100_000,
+        patch_px: int | None = None,
+    ):
+        self.cell = cell
+        self.request_overhead_px = request_overhead_px
+        # pixels one /draw can carry (PSRAM bound); None = unlimited
+        self.patch_px = patch_px
+        self.cells: set[tuple[int, int]] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.cells)
+
+    def cells_of(self, rect: Rect) -> set[tuple[int, int]]:
+        """Grid cells touched by ``rect``."""
+        c = self.cell
+        return {
+            (cx, cy)
+            for cy in range(rect.y // c, -(-rect.y2 // c))
+            for cx in range(rect.x // c, -(-rect.x2 // c))
+        }
+
+    def add(self, rect: Rect) -> None:
+        """Mark every grid cell touched by ``rect`` dirty."""
+        self.cells |= self.cells_of(rect)
+
+    def clear(self) -> None:
+        self.cells.clear()
+
+    # ───────────────────────── cost model ─────────────────────────
+
+    def requests(self, r: Rect) -> int:
+        """Number of /draw patches needed for ``r``."""
+        if not self.patch_px:
+            return 1
+        rows = max(self.patch_px // r.w, 2) // 2 * 2
+        return -(-r.h // rows)
+
+    def cost(self, r: Rect) -> int:
+        return self.requests(r) * self.request_overhead_px + r.w * r.h
+
+    # ─────────────────────────── regions ──────────────────────────
+
+    def _cell_rects(self) -> list[Rect]:
+        """Decompose the dirty cells into rectangles (row runs, stacked)."""
+        rows: dict[int, list[int]] = {}
+        for cx, cy in self.cells:
+            rows.setdefault(cy, []).append(cx)
+        open_runs: dict[tuple[int, int], list[int]] = {}  # (x0, x1) -> [y0, y1]
+        done: list[tuple[int, int, int, int]] = []
+        for cy in sorted(rows):
+            xs = sorted(rows[cy])
+            runs, start = [], xs[0]
+            for a, b in zip(xs, xs[1:] + [None]):
+                if b != a + 1:
+                    runs.append((start, a + 1))
+                    start = b
+            next_open = {}
+            for run in runs:
+                span = open_runs.pop(run, None)
+                if span is not None and span[1] == cy:
+                    span[1] = cy + 1
+                else:
+                    if span is not None:
+                        done.append((*run, *span))
+                    span = [cy, cy + 1]
+                next_open[run] = span
+            done += [(x0, x1, y0, y1) for (x0, x1), (y0, y1) in open_runs.items()]
+            open_runs = next_open
+        done += [(x0, x1, y0, y1) for (x0, x1), (y0, y1) in open_runs.items()]
+        c = self.cell
+        return [Rect(x0 * c, y0 * c, (x1 - x0) * c, (y1 - y0) * c) for x0, x1, y0, y1 in done]
+
+    def regions(self, avoid: set[tuple[int, int]] = frozenset()) -> list[Rect]:
+        """Minimal-cost set of upload rectangles covering all dirty cells.
+
+        Merged rectangles never cover a cell in ``avoid`` (held back tiles).
+        """
+        if not self.cells:
+            return []
+        rects = self._cell_rects()
+        while len(rects) > 1:
+            best = None
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    u = rects[i].union(rects[j])
+                    if avoid and not avoid.isdisjoint(self.cells_of(u)):
+                        continue
+                    inside = [
+                        k
+                        for k, r in enumerate(rects)
+                        if r.x >= u.x and r.y >= u.y and r.x2 <= u.x2 and r.y2 <= u.y2
+                    ]
+                    saving = sum(self.cost(rects[k]) for k in inside) - self.cost(u)
+                    if saving > 0 and (best is None or saving > best[0]):
+                        best = (saving, u, inside)
+            if best is None:
+                break
+            _, u, inside = best
+            rects = [r for k, r in enumerate(rects) if k not in inside] + [u]
+        return sorted(rects, key=lambda r: (r.y, r.x))
@@ -0,0 +1,248 @@
+"""One physical panel: its host, the tiles it shows and its upload worker.
+
+Components are rendered once by the UI; every display that shows a
+component gets the frame pasted into its own compositor and queues its
+own upload. Each display runs an independent upload worker, so slow or
+unreachable panels do not hold back the others. With a ``PanelShadow`` a
+frame the panel already shows is composed without being uploaded, and a
+tile whose newer frame is still rendering waits for it. With a
+``RefreshBudget`` tiles are rate limited and prioritised (their regions
+stay dirty until their turn) and the panel gets clean refreshes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable
+
+import metrics
+from compositor import Compositor
+from damage import Rect
+from refresh_budget import RefreshBudget
+from render_cache import PanelShadow, frame_digest
+from send_image import http_post
+from startup import mark
+
+
+CLEAN = "\0clean"  # queue token: clear the panel and repaint everything
+
+
+class Display:
+    def __init__(
+        self,
+        name: str,
+        host: str,
+        components: Iterable,
+        coalesce_window: float = 0.2,
+        request_overhead_px: int = 100_000,
+        clear_at_start: bool = False,
+        shadow: PanelShadow | None = None,
+        compressed: bool = True,
+        shared: str | Path | None = None,
+        budget: RefreshBudget | None = None,
+    ):
+        self.name = name
+        self.host = host
+        self.clear_at_start = clear_at_start
+        components = list(components)
+        self.names = {c.name for c in components}
+        self.compositor = Compositor.from_components(
+            components,
+            request_overhead_px=request_overhead_px,
+            compressed=compressed,
+            shared=shared,
+        )
+        self.coalesce_window = coalesce_window
+        self.shadow = shadow
+        self.budget = budget
+        self.rects: dict[str, Rect] = {}
+        self._set_tiles(components)
+        self._pasted: dict[str, str] = {}  # name -> digest of the frame in the framebuffer
+        # called as on_uploaded(display, component name, HA receipt time)
+        self.on_uploaded: Callable[["Display", str, float | None], None] | None = None
+        # superseded(name): a newer frame of the tile is being rendered, skip this one
+        self.superseded: Callable[[str], bool] | None = None
+
+        # one queued upload per component at a time
+        self._pending: dict[str, tuple[float | None, asyncio.Future]] = {}
+        self._unbudgeted: set[str] = set()  # queued with budget=False
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self.coalesced = 0
+        self.stale_uploads = 0
+        self.failures = 0
+        self._first = True
+        self._clean = False  # a clean refresh is queued
+
+    def _set_tiles(self, components: list) -> None:
+        self.rects = {c.name: Rect(c.x_px, c.y_px, c.width_px, c.height_px) for c in components}
+        if self.budget is not None:
+            for c in components:
+                self.budget.set_policy(
+                    c.name,
+                    getattr(c, "priority", "normal"),
+                    getattr(c, "min_refresh_interval", 0.0),
+                )
+
+    def shows(self, name: str) -> bool:
+        return name in self.names
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending) or not self._queue.empty()
+
+    def relayout(self, components: Iterable, vacated: Iterable[Rect] = ()) -> None:
+        """Show a new set of tiles; ``vacated`` areas are blanked on the panel."""
+        components = list(components)
+        self.names = {c.name for c in components}
+        self._set_tiles(components)
+        self.compositor.relayout(components)
+        for name in list(self._pasted):
+            if name not in self.names:
+                del self._pasted[name]
+        for rect in vacated:
+            self.compositor.clear(rect)
+
+    def forget(self, name: str) -> None:
+        """Drop what the panel is known to show for a tile (moved or rebuilt)."""
+        self._pasted.pop(name, None)
+        if self.shadow is not None:
+            self.shadow.tiles.pop(name, None)
+
+    def paste(self, component, damage: Iterable[Rect] | None = None) -> None:
+        """Compose a new frame; ``damage`` limits the dirty area (tile coordinates)."""
+        frame = component.frame
+        x, y = component.x_px, component.y_px
+        dirty = True
+        if self.shadow is not None:
+            digest = self._pasted[component.name] = frame_digest(frame)
+            dirty = not self.shadow.shows(component.name, digest)
+        if dirty and damage is not None:
+            dirty = [Rect(x + r.x, y + r.y, r.w, r.h) for r in damage]
+        self.compositor.paste(x, y, frame, dirty=dirty)
+
+    async def upload(
+        self, name: str, received: float | None = None, budget: bool = True
+    ) -> bool:
+        """Queue an upload of a component and wait until it reached this panel.
+
+        With ``budget=False`` the refresh budget doesn't hold the tile back
+        (the cold-start paint goes out in one pass).
+        """
+        if not budget:
+            self._unbudgeted.add(name)
+        pending = self._pending.get(name)
+        if pending is not None:
+            # still queued: that upload will read the newest image anyway
+            self.coalesced += 1
+            metrics.SKIPPED.inc(component=name, reason="coalesced")
+            fut = pending[1]
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[name] = (received, fut)
+            self._queue.put_nowait(name)
+        return await asyncio.shield(fut)
+
+    def _admit(self, names: list[str]) -> list[str]:
+        """The tiles the refresh budget lets through now; others are re-queued later."""
+        if self.budget is None:
+            return names
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        ready = []
+        for name in names:
+            if name in self._unbudgeted:
+                ready.append(name)
+                continue
+            wait, reason = self.budget.wait(name, names, now)
+            if wait > 0:
+                metrics.DEFERRED.inc(component=name, reason=reason)
+                loop.call_later(wait, self._queue.put_nowait, name)
+            else:
+                ready.append(name)
+        return ready
+
+    def _skip_superseded(self, names: list[str]) -> list[str]:
+        """Hold back tiles about to get a newer frame; they are re-queued shortly."""
+        if self.superseded is None:
+            return names
+        loop = asyncio.get_running_loop()
+        ready = []
+        for name in names:
+            if self.superseded(name):
+                self.stale_uploads += 1
+                metrics.SKIPPED.inc(component=name, reason="superseded")
+                loop.call_later(self.coalesce_window, self._queue.put_nowait, name)
+            else:
+                ready.append(name)
+        return ready
+
+    async def maintain(self, interval: float = 60.0) -> None:
+        """Queue a clean refresh whenever the refresh budget asks for one."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.budget is not None and not self._clean and self.budget.clean_due():
+                self._clean = True
+                self._queue.put_nowait(CLEAN)
+
+    async def run(self) -> None:
+        """Flush the framebuffer once for everything queued since the last pass."""
+        while True:
+            names = [await self._queue.get()]
+            # let neighbouring tiles that change in the same tick join this pass
+            await asyncio.sleep(self.coalesce_window)
+            while not self._queue.empty():
+                names.append(self._queue.get_nowait())
+            clean = CLEAN in names
+            # a re-queued tile may have gone out with a clean refresh meanwhile
+            names = [n for n in dict.fromkeys(names) if n in self._pending]
+            if clean:
+                names = list(self._pending)  # the repaint carries everything
+            else:
+                names = self._admit(self._skip_superseded(names))
+                if not names:
+                    continue
+            # tiles still waiting for their turn keep their regions dirty
+            hold = [self.rects[n] for n in self._pending if n not in names and n in self.rects]
+            pending = [(name, *self._pending.pop(name)) for name in names]
+            self._unbudgeted.difference_update(names)
+            pasted = dict(self._pasted)
+            ok = False
+            try:
+                if clean:
+                    print(f"[{datetime.now():%H:%M:%S}] Clean refresh of {self.name}")
+                    await asyncio.to_thread(http_post, self.host, "/clear")
+                    self.compositor.invalidate()
+                await asyncio.to_thread(self.compositor.flush, self.host, hold)
+                ok = True
+            except Exception as e:
+                self.failures += 1
+                metrics.UPLOAD_FAILURES.inc()
+                print(f"[!] Error updating panel {self.name} ({', '.join(names)}): {e}")
+            finally:
+                if clean:
+                    self._clean = False
+                for _, _, fut in pending:
+                    if not fut.done():
+                        fut.set_result(ok)
+            if not ok:
+                continue
+            if clean:
+                names = list(self.rects)  # the repaint carried every tile
+            if self.budget is not None:
+                if clean:
+                    self.budget.cleaned()
+                self.budget.refreshed(names, time.monotonic())
+            for name in names:
+                metrics.REFRESHES.inc(display=self.name, component=name)
+            if self.shadow is not None:
+                # held back tiles are still dirty: the panel doesn't show them yet
+                self.shadow.update({n: pasted[n] for n in names if n in pasted})
+            if self._first:
+                mark(f"first tiles on {self.name} ({len(names)})")
+                self._first = False
+            if self.on_uploaded is not None:
+                for name, received, _ in pending:
+                    self.on_uploaded(self, name, received)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Local emulator of the ESP32-EPD HTTP firmware.
+
+Speaks the protocol used by ``send_image.py``:
+
+* ``GET /``       – ``width``/``height``/``temperature`` response headers and
+  ``encodings`` (compressed draw bodies it accepts, e.g. ``zlib,rle``)
+* ``GET /free``   – free PSRAM in bytes
+* ``POST /clear`` – blank the panel
+* ``POST /draw``  – ``x``/``y``/``width``/``height``/``clear``/``bw`` headers,
+  body packed 2ppB (4-bit gray) or, with ``bw: 1``, 8ppB (1-bit); an
+  ``encoding: zlib|rle`` header marks a compressed body
+
+Every draw is decoded into an 8-bit framebuffer that can be inspected
+(``EpdEmulator.image()``, ``GET /snapshot.png``). PSRAM size, link
+bandwidth, per-request latency and failures are configurable, so the upload
+path can be benchmarked and tested without the board:
+
+    with EpdEmulator(bandwidth=500_000) as dev:
+        draw_image(dev.host, path, ...)
+        dev.image().save("panel.png")
+
+or from a shell::
+
+    python epd_emulator.py --port 8080 --bandwidth 500k
+    python send_image.py 127.0.0.1:8080 draw photo.jpg
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+from send_image import _HI, _LO
+
+# byte -> pixel lookup tables for bytes.translate(), 1 bit per pixel
+_BITS = [bytes(0 if b >> (7 - i) & 1 else 255 for b in range(256)) for i in range(8)]
+
+
+def decode_2ppB(payload: bytes) -> bytearray:
+    """Two 4-bit pixels per byte, high nibble first."""
+    out = bytearray(len(payload) * 2)
+    out[0::2] = payload.translate(_HI)
+    out[1::2] = payload.translate(_LO)
+    return out
+
+
+def decode_8ppB(payload: bytes) -> bytearray:
+    """Eight 1-bit pixels per byte, MSB first, 1 = black."""
+    out = bytearray(len(payload) * 8)
+    for i, table in enumerate(_BITS):
+        out[i::8] = payload.translate(table)
+    return out
+
+
+def decode_rle(data: bytes) -> bytes:
+    """PackBits: header n < 128 → n+1 literal bytes, n > 128 → next byte × (257-n)."""
+    out = bytearray()
+    i, end = 0, len(data)
+    while i < end:
+        n = data[i]
+        i += 1
+        if n < 128:
+            out += data[i : i + n + 1]
+            i += n + 1
+        elif n > 128:
+            out += data[i : i + 1] * (257 - n)
+            i += 1
+    return bytes(out)
+
+
+DECODERS = {"zlib": zlib.decompress, "rle": decode_rle}
+
+
+class DrawRecord(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+    bw: bool
+    nbytes: int  # body bytes as sent
+    encoding: str = "raw"
+
+
+class EpdEmulator:
+    def __init__(
+        self,
+        width: int = 2560,
+        height: int = 1600,
+        temperature: int = 22,
+        psram: int = 4 * 1024 * 1024,
+        bandwidth: float | None = None,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        encodings: tuple[str, ...] = ("zlib", "rle"),
+        seed: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.width = width
+        self.height = height
+        self.temperature = temperature
+        self.psram = psram  # free PSRAM reported by /free
+        self.bandwidth = bandwidth  # request body bytes per second, None = unlimited
+        self.latency = latency  # seconds added to every request
+        self.fail_rate = fail_rate  # probability a request fails with 500
+        self.encodings = tuple(encodings)  # () = firmware without compression
+        self._rng = random.Random(seed)
+        self._fail_next: list[int] = []
+
+        self.framebuffer = bytearray(b"\xff" * (width * height))
+        self.lock = threading.Lock()
+        self.draws: list[DrawRecord] = []
+        self.requests = 0
+        self.bytes_received = 0
+        self.clears = 0
+        self.failures = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    # ─────────────────────────── control ────────────────────────────
+
+    @property
+    def host(self) -> str:
+        """``host:port`` as expected by send_image's ``host`` argument."""
+        addr, port = self._server.server_address[:2]
+        return f"{addr}:{port}"
+
+    def start(self) -> "EpdEmulator":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="epd-emulator", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "EpdEmulator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def fail_next(self, n: int = 1, status: int = 500) -> None:
+        """Make the next ``n`` requests fail with ``status``."""
+        with self.lock:
+            self._fail_next += [status] * n
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.draws.clear()
+            self.requests = self.bytes_received = self.clears = self.failures = 0
+
+    def image(self):
+        """Current framebuffer as a PIL ``L`` image."""
+        from PIL import Image
+
+        with self.lock:
+            return Image.frombytes("L", (self.width, self.height), bytes(self.framebuffer))
+
+    # ─────────────────────────── device ─────────────────────────────
+
+    def _clear(self) -> None:
+        self.framebuffer[:] = b"\xff" * len(self.framebuffer)
+        self.clears += 1
+
+    def _draw(self, headers, payload: bytes) -> tuple[int, str]:
+        try:
+            x, y = int(headers["x"]), int(headers["y"])
+            w, h = int(headers["width"]), int(headers["height"])
+        except (KeyError, ValueError):
+            return 400, "missing or invalid geometry headers"
+        bw = headers.get("bw", "0") == "1"
+        if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > self.width or y + h > self.height:
+            return 400, "ROI out of bounds"
+        expected = (w * h + 7) // 8 if bw else (w * h + 1) // 2
+        sent = len(payload)
+        encoding = headers.get("encoding", "raw")
+        if encoding != "raw":
+            if encoding not in self.encodings:
+                return 415, f"unsupported encoding {encoding}"
+            if sent + expected > self.psram:
+                return 500, "out of PSRAM"
+            try:
+                payload = DECODERS[encoding](payload)
+            except Exception as e:
+                return 400, f"bad {encoding} body: {e}"
+        if len(payload) != expected:
+            return 400, f"payload is {len(payload)} B, expected {expected} B"
+        if len(payload) > self.psram:
+            return 500, "out of PSRAM"
+
+        pixels = decode_8ppB(payload) if bw else decode_2ppB(payload)
+        with self.lock:
+            if headers.get("clear", "0") == "1":
+                self._clear()
+            fb, W = self.framebuffer, self.width
+            for row in range(h):
+                start = (y + row) * W + x
+                fb[start : start + w] = pixels[row * w : (row + 1) * w]
+            self.draws.append(DrawRecord(x, y, w, h, bw, sent, encoding))
+        return 200, "OK"
+
+    def _handler(self):
+        emu = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes = b"", headers: dict | None = None):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, str(v))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _begin(self) -> bytes | None:
+                """Read the body, apply latency/bandwidth, maybe inject a failure."""
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                delay = emu.latency
+                if emu.bandwidth:
+                    delay += len(body) / emu.bandwidth
+                if delay:
+                    time.sleep(delay)
+                with emu.lock:
+                    emu.requests += 1
+                    emu.bytes_received += len(body)
+                    status = emu._fail_next.pop(0) if emu._fail_next else None
+                    if status is None and emu.fail_rate and emu._rng.random() < emu.fail_rate:
+                        status = 500
+                    if status is not None:
+                        emu.failures += 1
+                if status is not None:
+                    self._reply(status, b"injected failure")
+                    return None
+                return body
+
+            def do_GET(self):
+                if self._begin() is None:
+                    return
+                if self.path == "/":
+                    self._reply(
+                        200,
+                        headers={
+                            "width": emu.width,
+                            "height": emu.height,
+                            "temperature": emu.temperature,
+                            **({"encodings": ",".join(emu.encodings)} if emu.encodings else {}),
+                        },
+                    )
+                elif self.path == "/free":
+                    self._reply(200, str(emu.psram).encode())
+                elif self.path == "/snapshot.png":
+                    import io
+
+                    buf = io.BytesIO()
+                    emu.image().save(buf, format="PNG")
+                    self._reply(200, buf.getvalue(), {"Content-Type": "image/png"})
+                else:
+                    self._reply(404, b"not found")
+
+            def do_POST(self):
+                body = self._begin()
+                if body is None:
+                    return
+                if self.path == "/clear":
+                    with emu.lock:
+                        emu._clear()
+                    self._reply(200, b"OK")
+                elif self.path == "/draw":
+                    status, msg = emu._draw(self.headers, body)
+                    self._reply(status, msg.encode())
+                else:
+                    self._reply(404, b"not found")
+
+        return Handler
+
+
+# ─────────────────────────── CLI ─────────────────────────────────
+
+
+def _size(value: str) -> float:
+    """Parse sizes like 500k, 4M, 1.5M."""
+    units = {"k": 1024, "m": 1024**2, "g": 1024**3}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="ESP32‑EPD firmware emulator")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--width", type=int, default=2560)
+    p.add_argument("--height", type=int, default=1600)
+    p.add_argument("--psram", type=_size, default=4 * 1024**2, help="free PSRAM, e.g. 4M")
+    p.add_argument("--bandwidth", type=_size, help="bytes/s, e.g. 500k")
+    p.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    p.add_argument("--fail-rate", type=float, default=0.0)
+    p.add_argument(
+        "--encodings", default="zlib,rle", help='compressed bodies accepted ("" = none)'
+    )
+    p.add_argument("--seed", type=int)
+    p.add_argument("--snapshot", help="save the framebuffer to this PNG on exit")
+    return p.parse_args()
+
+
+def main() -> None:
+    a = cli()
+    emu = EpdEmulator(
+        width=a.width,
+        height=a.height,
+        psram=int(a.psram),
+        bandwidth=a.bandwidth,
+        latency=a.latency,
+        fail_rate=a.fail_rate,
+        encodings=tuple(e for e in a.encodings.split(",") if e),
+        seed=a.seed,
+        host=a.host,
+        port=a.port,
+    )
+    print(f"EPD emulator {a.width}x{a.height} listening on {emu.host}")
+    try:
+        emu._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emu._server.server_close()
+        print(
+            f"{emu.requests} requests, {len(emu.draws)} draws, "
+            f"{emu.bytes_received} B received, {emu.failures} failures"
+        )
+        if a.snapshot:
+            emu.image().save(a.snapshot)
+            print(f"Framebuffer saved to {a.snapshot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Record what the dashboard receives, to replay it later.
+
+With ``ui_settings.trace`` set to a path, ``UI`` writes the incoming
+``state_changed`` events of the watched entities (those in config.yaml)
+and every timer firing to a JSON-lines trace, gzipped if the path ends in
+``.gz``. Offsets ``t`` are seconds since the recording started, and only
+the attributes the dashboard keeps are stored (see
+``entities.<id>.attributes``):
+
+    {"t": 0.0, "entity_id": "light.x", "state": "on", "attributes": {}, "initial": true}
+    {"t": 12.417, "entity_id": "light.x", "state": "off", "attributes": {}}
+    {"t": 60.0, "timer": "temperature_chart"}
+
+Lines marked ``initial`` are the states known when recording started.
+The format is the event script of ``fake_ha.py``, so a trace is replayed
+through the full render and upload pipeline with
+
+    python ha_load.py --script output/traces/<file>.jsonl.gz --speed 10
+
+``python event_trace.py <file>`` summarises a trace (duration, rates,
+busiest second, busiest entities).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+
+def open_trace(path: str | Path, mode: str = "rt") -> io.TextIOBase:
+    """Open a trace for reading ("rt") or writing ("xt"), gzipped by suffix."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_trace(path: str | Path) -> list[dict]:
+    lines = []
+    with open_trace(path) as f:
+        try:
+            for line in f:
+                if line.strip():
+                    lines.append(json.loads(line))
+        except (EOFError, json.JSONDecodeError):
+            pass  # cut off by a crash: keep what was flushed
+    return lines
+
+
+class TraceRecorder:
+    def __init__(self, path: str | Path, flush_every: int = 100):
+        path = Path(datetime.now().strftime(str(path)))  # may contain %Y%m%d-%H%M%S etc.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # one file per run: offsets restart at 0
+        name, suffix = path.name.split(".", 1) if "." in path.name else (path.name, "")
+        n = 1
+        while path.exists():
+            n += 1
+            path = path.with_name(f"{name}-{n}.{suffix}" if suffix else f"{name}-{n}")
+        self.path = path
+        self._file = open_trace(self.path, "xt")
+        self._start = time.monotonic()
+        self._unflushed = 0
+        self.flush_every = flush_every
+        self.lines = 0
+
+    def _write(self, line: dict) -> None:
+        self._file.write(json.dumps(line, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self.lines += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def _offset(self, at: float | None) -> float:
+        return round((time.monotonic() if at is None else at) - self._start, 3)
+
+    def initial(self, entities) -> None:
+        """Record the states known at the start (``ha.Entity`` objects)."""
+        for e in entities:
+            if e.state is not None:
+                self._write(
+                    {
+                        "t": 0.0,
+                        "entity_id": e.entity_id,
+                        "state": e.state,
+                        "attributes": e.attributes,
+                        "initial": True,
+                    }
+                )
+
+    def event(self, data: dict, received: float | None = None, keep=()) -> None:
+        """Record a state_changed event; ``keep``: the attributes worth storing."""
+        new_state = data.get("new_state")
+        if new_state is None:
+            return
+        attributes = new_state.get("attributes") or {}
+        self._write(
+            {
+                "t": self._offset(received),
+                "entity_id": data["entity_id"],
+                "state": new_state.get("state"),
+                "attributes": {k: attributes[k] for k in keep if k in attributes},
+            }
+        )
+
+    def timer(self, name: str) -> None:
+        self._write({"t": self._offset(None), "timer": name})
+
+    def flush(self) -> None:
+        try:
+            self._file.flush()
+        except OSError as e:
+            print(f"[!] Couldn't write trace {self.path}: {e}")
+        self._unflushed = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+# ─────────────────────────── CLI ─────────────────────────────────
+
+
+def summary(lines: list[dict]) -> dict:
+    events = [e for e in lines if "entity_id" in e and not e.get("initial")]
+    timers = [e for e in lines if "timer" in e]
+    duration = max((e["t"] for e in lines), default=0.0)
+    per_second = Counter(int(e["t"]) for e in events)
+    busiest = per_second.most_common(1)
+    return {
+        "duration_s": duration,
+        "initial_states": sum(1 for e in lines if e.get("initial")),
+        "events": len(events),
+        "timer_firings": len(timers),
+        "events_per_s": round(len(events) / duration, 2) if duration else 0.0,
+        "peak_events_per_s": busiest[0][1] if busiest else 0,
+        "peak_at_s": busiest[0][0] if busiest else None,
+        "top_entities": Counter(e["entity_id"] for e in events).most_common(5),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Summarise a recorded event trace")
+    p.add_argument("trace", type=Path)
+    p.add_argument("--json", action="store_true")
+    a = p.parse_args()
+    s = summary(read_trace(a.trace))
+    if a.json:
+        print(json.dumps(s, indent=2))
+        return
+    print(
+        f"{a.trace}: {s['events']} events, {s['timer_firings']} timer firings "
+        f"in {s['duration_s']:.0f} s ({s['events_per_s']}/s, "
+        f"peak {s['peak_events_per_s']}/s at {s['peak_at_s']} s)"
+    )
+    for eid, n in s["top_entities"]:
+        print(f"  {n:6d}  {eid}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Synthetic Home Assistant for load testing the event pipeline.
+
+Serves the subset of the HA API the dashboard uses:
+
+* ``GET /api/``, ``GET /api/states``, ``GET /api/states/<entity_id>``
+* ``GET /api/history/period/<start>?filter_entity_id=...`` – 24 h of
+  5‑minute samples plus every state the server has emitted since
+* ``/api/websocket`` – ``auth_required`` → ``auth`` → ``auth_ok``, then
+  ``subscribe_events`` for ``state_changed``
+
+Entities come from ``config.yaml``; numeric sensors random-walk, on/off
+entities toggle, buttons/events get a fresh timestamp. Events are generated
+at a random (Poisson) rate or replayed from a JSON-lines script::
+
+    {"t": 0.0, "entity_id": "light.x", "state": "on", "attributes": {}}
+
+Used by ``ha_load.py``; can also run standalone for manual testing::
+
+    python fake_ha.py --port 8123 --rate 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import concurrent.futures
+import http
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from websockets.asyncio.server import broadcast, serve
+from websockets.exceptions import ConnectionClosed
+
+from event_trace import read_trace
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _initial_state(entity_id: str, rng: random.Random) -> tuple[str, dict]:
+    domain = entity_id.split(".", 1)[0]
+    if domain == "sensor" and entity_id.endswith("_temperature"):
+        return f"{rng.uniform(18, 26):.1f}", {
+            "unit_of_measurement": "°C",
+            "device_class": "temperature",
+        }
+    if domain in ("light", "switch", "humidifier", "binary_sensor", "fan"):
+        return rng.choice(["on", "off"]), {}
+    if domain in ("button", "event"):
+        return _iso(time.time()), {}
+    return "ok", {}
+
+
+def _next_state(entity_id: str, state: str, rng: random.Random) -> str:
+    try:
+        return f"{float(state) + rng.choice([-0.1, 0.1]):.1f}"  # 随机游走
+    except ValueError:
+        pass
+    if state in ("on", "off"):
+        return "off" if state == "on" else "on"
+    if entity_id.startswith(("button.", "event.")):
+        return _iso(time.time())
+    return rng.choice(["ok", "degraded"])
+
+
+def load_script(path: str) -> list[dict]:
+    """Read a JSON-lines event script or trace (.gz too), sorted by its ``t`` offsets."""
+    return sorted(read_trace(path), key=lambda e: e.get("t", 0.0))
+
+
+class FakeHomeAssistant:
+    def __init__(
+        self,
+        entities,
+        token: str = "fake-token",
+        seed: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.token = token
+        self._rng = random.Random(seed)
+        self._bind = (host, port)
+        self.subscribers: set = set()
+        self.subscribed = threading.Event()  # set on the first subscription
+        self.events_sent = 0  # state_changed events generated
+        self.messages_sent = 0  # event messages written to subscribers
+        self.rest_requests = 0
+
+        now = time.time()
+        self.states: dict[str, dict] = {}
+        for eid in entities:
+            state, attributes = _initial_state(eid, self._rng)
+            self.states[eid] = self._state_obj(eid, state, attributes, now)
+        self.history: dict[str, list[tuple[float, str]]] = {eid: [] for eid in self.states}
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server = None
+        self._thread: threading.Thread | None = None
+        self._started = threading.Event()
+
+    # ─────────────────────────── control ────────────────────────────
+
+    @property
+    def url(self) -> str:
+        """Base URL for ``secrets.yaml`` → ``homeassistant.url``."""
+        addr, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{addr}:{port}"
+
+    def start(self) -> "FakeHomeAssistant":
+        self._thread = threading.Thread(target=self._serve, name="fake-ha", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeHomeAssistant":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _serve(self) -> None:
+        async def main():
+            self._loop = asyncio.get_running_loop()
+            async with serve(
+                self._ws_handler,
+                *self._bind,
+                process_request=self._process_request,
+                max_size=None,
+            ) as server:
+                self._server = server
+                self._started.set()
+                await server.wait_closed()
+
+        asyncio.run(main())
+
+    # ─────────────────────────── events ─────────────────────────────
+
+    def set_state(self, entity_id: str, state: str, attributes: dict | None = None):
+        """Change a state from any thread and broadcast ``state_changed``."""
+        self._loop.call_soon_threadsafe(self._emit, entity_id, state, attributes)
+
+    def run_load(
+        self, rate: float, duration: float, entities: list[str] | None = None
+    ) -> concurrent.futures.Future:
+        """Emit random changes at ``rate``/s (Poisson) for ``duration`` seconds."""
+        return asyncio.run_coroutine_threadsafe(
+            self._random_events(rate, duration, entities), self._loop
+        )
+
+    def run_script(self, events: list[dict], speed: float = 1.0) -> concurrent.futures.Future:
+        """Replay scripted events at their ``t`` offsets divided by ``speed``."""
+        return asyncio.run_coroutine_threadsafe(self._scripted_events(events, speed), self._loop)
+
+    async def _random_events(self, rate, duration, entities):
+        entities = list(entities or self.states)
+        end = time.monotonic() + duration
+        while True:
+            await asyncio.sleep(self._rng.expovariate(rate))
+            if time.monotonic() >= end:
+                return
+            eid = self._rng.choice(entities)
+            self._emit(eid, _next_state(eid, self.states[eid]["state"], self._rng))
+
+    def preset(self, events: list[dict]) -> None:
+        """Take the states of script lines as current, without emitting events."""
+        now = time.time()
+        for ev in events:
+            self.states[ev["entity_id"]] = self._state_obj(
+                ev["entity_id"], str(ev["state"]), ev.get("attributes") or {}, now
+            )
+
+    async def _scripted_events(self, events, speed):
+        start = time.monotonic()
+        for ev in events:
+            if "entity_id" not in ev or ev.get("initial"):
+                continue  # timer firings, starting states
+            delay = start + ev.get("t", 0.0) / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._emit(ev["entity_id"], str(ev["state"]), ev.get("attributes"))
+
+    def _state_obj(self, eid: str, state: str, attributes: dict, ts: float) -> dict:
+        return {
+            "entity_id": eid,
+            "state": state,
+            "attributes": attributes,
+            "last_changed": _iso(ts),
+            "last_reported": _iso(ts),
+            "last_updated": _iso(ts),
+            "context": {"id": f"{self.events_sent:026d}", "parent_id": None, "user_id": None},
+        }
+
+    def _emit(self, eid: str, state: str, attributes: dict | None = None) -> None:
+        now = time.time()
+        old = self.states.get(eid)
+        if attributes is None:
+            attributes = old["attributes"] if old else {}
+        new = self._state_obj(eid, state, dict(attributes), now)
+        if old and old["state"] == state:
+            new["last_changed"] = old["last_changed"]
+        self.states[eid] = new
+        self.history.setdefault(eid, []).append((now, state))
+        self.events_sent += 1
+        for ws, sub_id in list(self.subscribers):
+            msg = {
+                "id": sub_id,
+                "type": "event",
+                "event": {
+                    "event_type": "state_changed",
+                    "data": {"entity_id": eid, "old_state": old, "new_state": new},
+                    "origin": "LOCAL",
+                    "time_fired": _iso(now),
+                    "context": new["context"],
+                },
+            }
+            broadcast([ws], json.dumps(msg))
+            self.messages_sent += 1
+
+    # ─────────────────────────── WebSocket ──────────────────────────
+
+    async def _ws_handler(self, ws) -> None:
+        subs = []
+        try:
+            await ws.send(json.dumps({"type": "auth_required", "ha_version": "fake"}))
+            msg = json.loads(await ws.recv())
+            if msg.get("type") != "auth" or msg.get("access_token") != self.token:
+                await ws.send(json.dumps({"type": "auth_invalid", "message": "Invalid access token"}))
+                return
+            await ws.send(json.dumps({"type": "auth_ok", "ha_version": "fake"}))
+            async for raw in ws:
+                msg = json.loads(raw)
+                reply = {"id": msg.get("id"), "type": "result", "success": True, "result": None}
+                if msg.get("type") == "subscribe_events" and msg.get("event_type") in (
+                    "state_changed",
+                    None,
+                ):
+                    await ws.send(json.dumps(reply))
+                    subs.append((ws, msg["id"]))
+                    self.subscribers.add(subs[-1])
+                    self.subscribed.set()
+                elif msg.get("type") == "ping":
+                    await ws.send(json.dumps({"id": msg.get("id"), "type": "pong"}))
+                else:
+                    reply.update(success=False, error={"code": "unknown_command"})
+                    await ws.send(json.dumps(reply))
+        except ConnectionClosed:
+            pass
+        finally:
+            for sub in subs:
+                self.subscribers.discard(sub)
+
+    # ──────────────────────────── REST ──────────────────────────────
+
+    def _process_request(self, connection, request):
+        url = urlsplit(request.path)
+        if url.path == "/api/websocket":
+            return None  # continue with the WebSocket handshake
+        self.rest_requests += 1
+        if request.headers.get("Authorization") != f"Bearer {self.token}":
+            return self._json(connection, http.HTTPStatus.UNAUTHORIZED, {"message": "401: Unauthorized"})
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        if path == "/api/":
+            return self._json(connection, http.HTTPStatus.OK, {"message": "API running."})
+        if path == "/api/states":
+            return self._json(connection, http.HTTPStatus.OK, list(self.states.values()))
+        if path.startswith("/api/states/"):
+            state = self.states.get(path[len("/api/states/") :])
+            if state is None:
+                return self._json(connection, http.HTTPStatus.NOT_FOUND, {"message": "Entity not found."})
+            return self._json(connection, http.HTTPStatus.OK, state)
+        if path.startswith("/api/history/period"):
+            eids = query.get("filter_entity_id", [""])[0].split(",")
+            return self._json(
+                connection, http.HTTPStatus.OK, [self._history(eid) for eid in eids if eid in self.states]
+            )
+        return self._json(connection, http.HTTPStatus.NOT_FOUND, {"message": "Not found"})
+
+    def _history(self, eid: str) -> list[dict]:
+        """24 h of 5‑minute samples followed by the emitted states."""
+        now = time.time()
+        entries = []
+        try:
+            level = float(self.states[eid]["state"])
+        except ValueError:
+            level = None
+        if level is not None:
+            phase = self._rng.uniform(0, 2 * math.pi)
+            for k in range(288, 0, -1):
+                t = now - k * 300
+                v = level + 1.5 * math.sin(2 * math.pi * t / 86400 + phase)
+                entries.append({"state": f"{v:.1f}", "last_changed": _iso(t)})
+        cutoff = now - timedelta(hours=24).total_seconds()
+        entries += [
+            {"state": s, "last_changed": _iso(t)} for t, s in self.history[eid] if t >= cutoff
+        ]
+        if not entries:
+            entries.append({"state": self.states[eid]["state"], "last_changed": self.states[eid]["last_changed"]})
+        entries[0] = {"entity_id": eid, "attributes": self.states[eid]["attributes"], **entries[0]}
+        return entries
+
+    @staticmethod
+    def _json(connection, status, body):
+        response = connection.respond(status, "")
+        response.body = json.dumps(body).encode()
+        for name in ("Content-Type", "Content-Length"):
+            del response.headers[name]
+        response.headers["Content-Type"] = "application/json"
+        response.headers["Content-Length"] = str(len(response.body))
+        return response
+
+
+# ─────────────────────────── CLI ─────────────────────────────────
+
+
+def cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Fake Home Assistant server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8123)
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--token", default="fake-token")
+    p.add_argument("--rate", type=float, default=1.0, help="random events per second")
+    p.add_argument("--script", help="JSON-lines event script instead of random events")
+    p.add_argument("--seed", type=int)
+    return p.parse_args()
+
+
+def main() -> None:
+    import yaml
+
+    a = cli()
+    entities = yaml.safe_load(Path(a.config).read_text())["entities"]
+    with FakeHomeAssistant(entities, a.token, a.seed, a.host, a.port) as fake:
+        print(f"Fake Home Assistant on {fake.url} (token {a.token!r}), {len(entities)} entities")
+        try:
+            if a.script:
+                script = load_script(a.script)
+                fake.preset([e for e in script if e.get("initial")])
+                fake.run_script(script).result()
+            while True:
+                if not a.script and a.rate > 0:
+                    fake.run_load(a.rate, 3600).result()
+                else:
+                    time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(f"{fake.events_sent} events, {fake.rest_requests} REST requests")
+
+
+if __name__ == "__main__":
+    main()
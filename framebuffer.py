@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Composed panel state in a memory-mapped file, plus a snapshot endpoint.
+
+Each display's compositor mirrors its framebuffer into
+``output/panel-<display>.fb`` so other local processes can map it and read
+the panel without asking the UI or copying anything:
+
+    64-byte header: magic ``EPFB``, seq (u64), width, height (u32, little endian)
+    then width*height bytes of 8-bit gray, row major (the file may be longer)
+
+``seq`` works as a seqlock: it is odd while a rectangle is being written and
+goes up by two per change, so a reader copies the pixels and checks that
+``seq`` is still the same even value.
+
+``start_server`` (``ui_settings.snapshot_port``, or ``python framebuffer.py
+output/panel-main.fb``) serves ``/<display>.png`` and ``/<display>.raw``.
+The PNG is only encoded when somebody asks for it and ``seq`` changed since
+the last request; responses carry ``ETag: <seq>`` for cheap polling.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from PIL import Image
+
+from startup import lazy_import
+
+MAGIC = b"EPFB"
+HEADER = struct.Struct("<4sQII")  # magic, seq, width, height
+OFFSET = 64
+
+
+class SharedFramebuffer:
+    """Writer side: owned by one compositor, written under its lock."""
+
+    def __init__(self, path: Path, image: Image.Image):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.seq = 0
+        try:
+            # carry on from the last run's seq so reader ETags stay unique
+            with open(self.path, "rb") as f:
+                magic, seq, _, _ = HEADER.unpack(f.read(HEADER.size))
+            if magic == MAGIC:
+                self.seq = seq + seq % 2
+        except (OSError, struct.error):
+            pass
+        self._mm: mmap.mmap | None = None
+        self.resize(image)
+
+    def _map(self, width: int, height: int) -> None:
+        size = OFFSET + width * height
+        np = lazy_import("numpy")  # not needed to import main / compositor
+        with open(self.path, "a+b") as f:
+            # only ever grow the file: readers may have all of it mapped, and
+            # touching pages past a shrunken end would kill them with SIGBUS
+            if os.fstat(f.fileno()).st_size < size:
+                os.ftruncate(f.fileno(), size)
+            mm = mmap.mmap(f.fileno(), size)
+        self.close()
+        self._mm = mm
+        self.width, self.height = width, height
+        self.pixels = np.frombuffer(self._mm, np.uint8, width * height, OFFSET).reshape(
+            height, width
+        )
+        self._header()
+
+    def _header(self) -> None:
+        HEADER.pack_into(self._mm, 0, MAGIC, self.seq, self.width, self.height)
+
+    def write(self, x: int, y: int, image: Image.Image) -> None:
+        """Copy an ``L`` image into the file at (x, y)."""
+        np = lazy_import("numpy")
+        self.seq += 1  # odd: write in progress
+        self._header()
+        w = min(image.width, self.width - x)
+        h = min(image.height, self.height - y)
+        self.pixels[y : y + h, x : x + w] = np.asarray(image)[:h, :w]
+        self.seq += 1
+        self._header()
+
+    def resize(self, image: Image.Image) -> None:
+        """(Re)map the file for a whole framebuffer and copy all of it."""
+        np = lazy_import("numpy")
+        self.seq += 1  # odd until the copy is complete
+        self._map(image.width, image.height)
+        self.pixels[:] = np.asarray(image)
+        self.seq += 1
+        self._header()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self.pixels = None
+            self._mm.close()
+            self._mm = None
+
+
+class FramebufferView:
+    """Reader side: maps the file once and copies pixels only on demand."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._mm: mmap.mmap | None = None
+        self._size = 0
+
+    def _map(self) -> mmap.mmap:
+        size = os.path.getsize(self.path)
+        if self._mm is None or size != self._size:
+            if self._mm is not None:
+                self._mm.close()
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = size
+        return self._mm
+
+    def header(self) -> tuple[int, int, int]:
+        """(seq, width, height) without touching the pixels."""
+        mm = self._map()
+        magic, seq, width, height = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a shared framebuffer")
+        return seq, width, height
+
+    def read(self, retries: int = 100) -> tuple[int, int, int, bytes]:
+        """A consistent (seq, width, height, pixels) copy."""
+        for _ in range(retries):
+            seq, width, height = self.header()
+            if seq % 2 == 0 and OFFSET + width * height <= self._size:
+                pixels = self._mm[OFFSET : OFFSET + width * height]
+                if self.header()[0] == seq:
+                    return seq, width, height, pixels
+            time.sleep(0.001)
+        raise TimeoutError(f"{self.path} kept changing")
+
+    def image(self) -> Image.Image:
+        _, width, height, pixels = self.read()
+        return Image.frombytes("L", (width, height), pixels)
+
+
+# ─────────────────────────── server ─────────────────────────────
+
+
+class _Snapshots:
+    """Lazily encoded PNGs per display, re-encoded only when seq changed."""
+
+    def __init__(self, paths: dict[str, Path]):
+        self.views = {name: FramebufferView(p) for name, p in paths.items()}
+        self._png: dict[str, tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def png(self, name: str) -> tuple[int, bytes]:
+        view = self.views[name]
+        with self._lock:
+            seq = view.header()[0]
+            cached = self._png.get(name)
+            if cached is None or cached[0] != seq:
+                seq, width, height, pixels = view.read()
+                buf = io.BytesIO()
+                Image.frombytes("L", (width, height), pixels).save(buf, format="PNG")
+                cached = self._png[name] = (seq, buf.getvalue())
+            return cached
+
+
+def _handler(snapshots: _Snapshots):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, body: bytes, ctype: str, headers: dict | None = None, status=200):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, str(v))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            name, _, ext = self.path.lstrip("/").rpartition(".")
+            try:
+                if self.path == "/":
+                    body = {
+                        n: dict(zip(("seq", "width", "height"), v.header()))
+                        for n, v in snapshots.views.items()
+                    }
+                    self._reply(json.dumps(body).encode(), "application/json")
+                elif name in snapshots.views and ext in ("png", "raw"):
+                    seq = snapshots.views[name].header()[0]
+                    if self.headers.get("If-None-Match") == f'"{seq}"':
+                        self._reply(b"", "text/plain", {"ETag": f'"{seq}"'}, status=304)
+                    elif ext == "png":
+                        seq, png = snapshots.png(name)
+                        self._reply(png, "image/png", {"ETag": f'"{seq}"'})
+                    else:
+                        seq, width, height, pixels = snapshots.views[name].read()
+                        self._reply(
+                            pixels,
+                            "application/octet-stream",
+                            {"ETag": f'"{seq}"', "width": width, "height": height},
+                        )
+                else:
+                    self.send_error(404)
+            except (OSError, ValueError, TimeoutError) as e:
+                self.send_error(503, str(e))
+
+    return Handler
+
+
+def start_server(paths: dict[str, Path], port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve snapshots of the given framebuffer files from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _handler(_Snapshots(paths)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="snapshots", daemon=True).start()
+    return server
+
+
+# ─────────────────────────── CLI ─────────────────────────────────
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Serve snapshots of shared panel framebuffers")
+    p.add_argument("files", nargs="+", type=Path, help="output/panel-<display>.fb")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9465)
+    a = p.parse_args()
+    paths = {f.stem.removeprefix("panel-"): f for f in a.files}
+    server = ThreadingHTTPServer((a.host, a.port), _handler(_Snapshots(paths)))
+    print(f"Snapshots of {', '.join(paths)} on http://{a.host}:{a.port}/<display>.png")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
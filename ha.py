@@ -1,28 +1,75 @@
-from datetime import datetime, timedelta, timezone
-import json, requests
-import numpy as np, pandas as pd
-from homeassistant_api import Client, WebsocketClient
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import copy, json, requests, threading, time
 from const import *
+from startup import lazy_import
+from typing import Callable
 from zoneinfo import ZoneInfo
 
 
+# guards the state slots / seq of every Entity: written by the event loop and
+# REST threads, read by render threads
+_states_lock = threading.Lock()
+
+
 class Entity:
+    """Cached state of one watched entity.
+
+    Only the state string, ``last_changed`` and the attributes listed under
+    ``attributes:`` in config.yaml are kept; HA sends many more (media
+    players, routers, ...) and those are dropped on arrival.
+    """
+
+    __slots__ = (
+        "entity_id",
+        "params",
+        "name",
+        "state_abnormal_str",
+        "state_str_name_mapping",
+        "keep",
+        "state",
+        "last_changed",
+        "attributes",
+        "seq",
+    )
+
     def __init__(self, entity_id: str, name: str = None):
         self.entity_id = entity_id
-        self.params = CONF_ENTITIES.get(entity_id, {})
-        self.name = self.params.get("name", name or entity_id)
+        self.state: str | None = None
+        self.last_changed: str | None = None
+        self.attributes: dict = {}
+        # version of the state, +1 per update; renders remember what they drew
+        self.seq = 0
+        self.configure(name)
+
+    def set_state(self, state: str, last_changed=None, attributes: dict | None = None) -> int:
+        """Replace the cached state; returns its new version."""
+        if isinstance(last_changed, datetime):
+            last_changed = last_changed.isoformat()
+        attributes = attributes or {}
+        kept = {k: attributes[k] for k in self.keep if k in attributes}
+        with _states_lock:
+            self.state = state
+            self.last_changed = last_changed
+            self.attributes = kept
+            self.seq += 1
+            return self.seq
+
+    def snapshot(self) -> "Entity":
+        """A frozen copy to render from: state and seq belong together."""
+        with _states_lock:
+            return copy.copy(self)
+
+    def configure(self, name: str = None) -> None:
+        """(Re)read this entity's settings from config.yaml; the state is kept."""
+        self.params = CONF_ENTITIES.get(self.entity_id, {})
+        self.name = self.params.get("name", name or self.entity_id)
         self.state_abnormal_str = self.params.get("state_abnormal_str", ["unavailable"])
         if isinstance(self.state_abnormal_str, str):
             self.state_abnormal_str = [self.state_abnormal_str]
         self.state_str_name_mapping = self.params.get("state_str_name_mapping", {})
-        # Initialize state and state dictionary
-        self._state = None
-        self.dict_states = {}
-
-    @property
-    def state(self) -> str:
-        self._state = self.dict_states.get("state", self._state)
-        return self._state
+        self.keep = tuple(self.params.get("attributes", ()))
 
     @property
     def normal(self) -> bool:
@@ -40,26 +87,44 @@ class Entity:
 
 ha_states: dict[str, Entity] = {}
 
-for eid in WATCHED:
-    ha_states[eid] = Entity(eid)
+
+def init_ha_states(fetch: bool = True) -> None:
+    """Create an Entity for every watched id and optionally pull its state."""
+    for eid in WATCHED:
+        ha_states.setdefault(eid, Entity(eid))
+    if fetch:
+        fetch_ha_states(WATCHED)
+
+
+def fetch_ha_states(entity_ids) -> None:
+    """Pull the current state of some entities over REST."""
+    Client = lazy_import("homeassistant_api").Client
+    try:
+        with Client(REST_URL, TOKEN) as client:
+            for eid in entity_ids:
+                get_entity_state_rest(client, eid)
+    except Exception as exc:
+        print(f"[!] Couldn't fetch initial states from Home Assistant: {exc}")
 
 
-def attr_diffs(old: dict | None, new: dict) -> dict:
-    """Return only keys whose value actually changed."""
-    if not old:
-        return new
-    return {k: new[k] for k, v in new.items() if v != old.get(k)}
+def attr_diffs(old: dict | None, new: dict, keys: tuple[str, ...]) -> dict:
+    """Return only the ``keys`` whose value actually changed."""
+    old = old or {}
+    return {k: new[k] for k in keys if k in new and new[k] != old.get(k)}
 
 
 def get_entity_state_rest(client, entity_id: str) -> dict | None:
-    global ha_states
     try:
         entity = client.get_entity(entity_id=entity_id)
         dict_states = entity.get_state()
         # print(dict_states)
         if dict_states:
-            ha_states[entity_id].dict_states = dict_states.model_dump(exclude_none=True)
             state = dict_states.state
+            ha_states[entity_id].set_state(
+                state,
+                getattr(dict_states, "last_changed", None),
+                getattr(dict_states, "attributes", None),
+            )
             print(f"[{datetime.now():%H:%M:%S}] {entity_id}: {state}")
             return str(state)
         else:
@@ -71,7 +136,6 @@ def get_entity_state_rest(client, entity_id: str) -> dict | None:
 
 def get_entity_state_local(entity_id: str) -> dict | None:
     """Get the current state of an entity from local cache."""
-    global ha_states
     if entity_id in ha_states:
         return ha_states[entity_id].state
     else:
@@ -81,35 +145,68 @@ def get_entity_state_local(entity_id: str) -> dict | None:
 
 def update_entity_from_state_changed(data: dict) -> None:
     """Update the entity state from a state_changed event."""
-    global ha_states
     eid = data["entity_id"]
     new_state = data["new_state"]
-    old_state = ha_states.get(eid).dict_states
+    if new_state is None:
+        return False  # entity removed from HA
+    entity = ha_states.get(eid)
 
     state_changed = False
 
     # 1) state string changed? (on/off/unavailable/…)
-    if not old_state or old_state["state"] != new_state["state"]:
+    if entity.seq == 0 or entity.state != new_state["state"]:
         state_changed = True
         print(
             f"[{datetime.now():%H:%M:%S}] {eid}: "
-            f"{old_state and old_state['state']} → {new_state['state']}"
+            f"{entity.state} → {new_state['state']}"
         )
 
-    # 2) attribute diffs
-    diff = attr_diffs(
-        old_state and old_state.get("attributes"), new_state["attributes"]
-    )
+    # 2) attribute diffs, only of the attributes we keep
+    attributes = new_state.get("attributes") or {}
+    diff = attr_diffs(entity.attributes, attributes, entity.keep)
     if diff:
         pretty = ", ".join(f"{k}: {v}" for k, v in diff.items())
         print(f"    ↳ attrs changed → {pretty}")
+        state_changed = True
 
-    ha_states[eid].dict_states = new_state  # update cache
+    entity.set_state(new_state["state"], new_state.get("last_changed"), attributes)  # update cache
 
     return state_changed
 
 
-def get_sensor_history(eid: str) -> pd.DataFrame | None:
+async def listen_state_changed(on_connect: Callable[[], None] | None = None):
+    """Subscribe to state_changed over the HA WebSocket API.
+
+    Async generator yielding ``(event data, monotonic receipt time)``;
+    ``on_connect`` is called once the subscription is confirmed.
+    """
+    ws_client = lazy_import("websockets.asyncio.client")
+    async with ws_client.connect(WS_URL, max_size=None) as ws:
+        json.loads(await ws.recv())  # auth_required
+        await ws.send(json.dumps({"type": "auth", "access_token": TOKEN}))
+        msg = json.loads(await ws.recv())
+        if msg.get("type") != "auth_ok":
+            raise ConnectionError(f"authentication failed: {msg.get('message', msg)}")
+        await ws.send(
+            json.dumps(
+                {"id": 1, "type": "subscribe_events", "event_type": "state_changed"}
+            )
+        )
+        async for raw in ws:
+            received = time.monotonic()
+            msg = json.loads(raw)
+            if msg.get("type") == "event":
+                yield msg["event"]["data"], received
+            elif msg.get("type") == "result":
+                if not msg.get("success"):
+                    raise ConnectionError(f"subscription failed: {msg.get('error')}")
+                if on_connect is not None:
+                    on_connect()
+
+
+def get_sensor_history_arrays(eid: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """Fetch the last 24h of a numeric sensor as (epoch seconds, values) arrays."""
+    np = lazy_import("numpy")
     headers = {
         "Authorization": f"Bearer {TOKEN}",
         "Content-Type": "application/json",
@@ -152,25 +249,16 @@ def get_sensor_history(eid: str) -> pd.DataFrame | None:
                     temp = float(state)
                 except (TypeError, ValueError):
                     temp = np.nan
-                times.append(last_changed)
+                try:
+                    ts = datetime.fromisoformat(last_changed).timestamp()
+                except (TypeError, ValueError):
+                    continue
+                times.append(ts)
                 temps.append(temp)
-
-            # Create pandas DataFrame with timezone-aware timestamps
-            df = pd.DataFrame(
-                {"time": pd.to_datetime(times, utc=True), "temperature": temps}
-            )
-            # Convert to the configured timezone
-            df["time"] = df["time"].dt.tz_convert(TIMEZONE)
-            # print(df)
-
-            # If you want a numpy matrix:
-            # matrix = df[["time", "temperature"]].to_numpy()
-            # print(matrix)
         else:
-            print("[!] get_sensor_history: No history data found")
-            df = pd.DataFrame({"time": [], "temperature": []})
+            print("[!] get_sensor_history_arrays: No history data found")
 
-        return df
+        return np.asarray(times, dtype=float), np.asarray(temps, dtype=float)
 
     except requests.exceptions.RequestException as e:
         print(f"Request error: {e}")
@@ -181,9 +269,5 @@ def get_sensor_history(eid: str) -> pd.DataFrame | None:
     return None
 
 
-with Client(REST_URL, TOKEN) as client:
-    for eid in WATCHED:
-        get_entity_state_rest(client, eid)
-
 if __name__ == "__main__":
-    get_sensor_history("sensor.temperature_humidity_sensor_a63c_temperature")
+    get_sensor_history_arrays("sensor.temperature_humidity_sensor_a63c_temperature")
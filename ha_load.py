@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Load test the HA event → render → panel pipeline.
+
+Starts a fake Home Assistant (``fake_ha.py``) and an EPD emulator
+(``epd_emulator.py``), points a temporary ``secrets.yaml`` at both and runs
+the real ``main.UI`` against them. Events are generated at ``--rate``/s
+for ``--duration`` seconds (or replayed from ``--script``), then the run
+drains and reports throughput, dropped/coalesced events and event → panel
+latency percentiles:
+
+    python ha_load.py --rate 20 --duration 30
+    python ha_load.py --script storm.jsonl --bandwidth 500k --json
+
+A script can be a trace recorded by the dashboard (``ui_settings.trace``,
+see ``event_trace.py``): its starting states are preset on the fake HA and
+its timer firings replace the UI's own timers, all at ``--speed``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+import yaml
+
+import const
+from epd_emulator import EpdEmulator, _size
+from fake_ha import FakeHomeAssistant, load_script
+
+
+def write_secrets(path: str, ha_url: str, token: str, panel_host: str) -> None:
+    """secrets.yaml for the run; the sunsethue block is kept from the real one."""
+    sunsethue = {"api_key": "", "latitude": 0.0, "longitude": 0.0}
+    with contextlib.suppress(OSError, KeyError, TypeError):
+        sunsethue = yaml.safe_load(Path("secrets.yaml").read_text())["sunsethue"]
+    secrets = {
+        "homeassistant": {"url": ha_url, "token": token, "reconnect_interval": 1},
+        "inkscreen": {"host": panel_host, "enable": True, "clear_at_start": False},
+        "sunsethue": sunsethue,
+    }
+    Path(path).write_text(yaml.safe_dump(secrets))
+
+
+async def replay_timers(ui, timers: list[dict], speed: float) -> list[asyncio.Task]:
+    """Start refreshes of timer components at the recorded offsets."""
+    start = time.monotonic()
+    runs = []
+    for ev in timers:
+        delay = start + ev["t"] / speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if ev["timer"] in ui.components:
+            runs.append(asyncio.create_task(ui.refresh(ev["timer"])))
+    return runs
+
+
+async def drive(
+    a: argparse.Namespace, fake: FakeHomeAssistant, emus: list[EpdEmulator]
+) -> dict:
+    from main import UI  # imported after load_config so it sees the fake hosts
+
+    ui = UI()
+    ui.latencies = deque()  # keep every sample for the percentiles
+    timers = [e for e in a.events if "timer" in e]
+    if timers:
+        ui.run_timers = False  # the trace says when they ran
+    task = asyncio.create_task(ui.run())
+    if not await asyncio.to_thread(fake.subscribed.wait, 30):
+        ui.stop()
+        await task
+        raise RuntimeError("UI never subscribed to the fake Home Assistant")
+    for emu in emus:
+        emu.reset_stats()
+    counters = lambda: (ui.events_received, ui.renders, ui.coalesced, ui.superseded)
+    before = counters()
+    ui.latencies.clear()
+    sent0 = fake.events_sent
+
+    t0 = time.monotonic()
+    runs = []
+    if a.script:
+        _, runs = await asyncio.gather(
+            asyncio.wrap_future(fake.run_script(a.events, a.speed)),
+            replay_timers(ui, timers, a.speed),
+        )
+    else:
+        await asyncio.wrap_future(fake.run_load(a.rate, a.duration))
+    generated = time.monotonic() - t0
+
+    # drain: wait until renders and uploads went quiet
+    deadline = time.monotonic() + a.drain
+    while time.monotonic() < deadline:
+        if not ui.busy:
+            await asyncio.sleep(ui.coalesce_window + 0.1)
+            if not ui.busy:
+                break
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - t0
+    await asyncio.gather(*runs, return_exceptions=True)
+    ui.stop()
+    await task
+
+    sent = fake.events_sent - sent0
+    received, renders, coalesced, superseded = (n - b for n, b in zip(counters(), before))
+    lat = ui.latency_stats()
+    return {
+        "duration_s": round(generated, 2),
+        "displays": len(emus),
+        "events_sent": sent,
+        "timer_runs": len(timers),
+        "events_received": received,
+        "dropped": sent - received,
+        "throughput_eps": round(received / generated, 1) if generated else 0.0,
+        "renders": renders,
+        "coalesced": coalesced,
+        "superseded": superseded,
+        "panel_updates": lat.get("count", 0),
+        "draw_requests": sum(len(emu.draws) for emu in emus),
+        "bytes_uploaded": sum(emu.bytes_received for emu in emus),
+        "latency_ms": {k: round(lat[k], 1) for k in ("p50", "p95", "p99", "max") if k in lat},
+        "drain_s": round(elapsed - generated, 2),
+    }
+
+
+def cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Event pipeline load test")
+    p.add_argument("--rate", type=float, default=10.0, help="events per second")
+    p.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    p.add_argument("--script", help="JSON-lines event script or recorded trace (.gz too)")
+    p.add_argument("--speed", type=float, default=1.0, help="script playback speed")
+    p.add_argument("--seed", type=int)
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--ha-only", action="store_true", help="only ha_event components")
+    p.add_argument(
+        "--displays", type=int, help="emulate N panels showing every tile (default: config)"
+    )
+    p.add_argument("--bandwidth", type=_size, help="emulated panel link, bytes/s")
+    p.add_argument("--latency", type=float, default=0.0, help="panel latency per request, s")
+    p.add_argument("--drain", type=float, default=30.0, help="max seconds to drain")
+    p.add_argument("--verbose", action="store_true", help="show the UI log")
+    p.add_argument("--json", action="store_true")
+    return p.parse_args()
+
+
+def main() -> None:
+    a = cli()
+    conf = yaml.safe_load(Path(a.config).read_text())
+    fake = FakeHomeAssistant(conf["entities"], seed=a.seed).start()
+    a.events = load_script(a.script) if a.script else []
+    fake.preset([e for e in a.events if e.get("initial")])
+    if a.displays:
+        displays = {f"panel{i}": {} for i in range(1, a.displays + 1)}
+    else:
+        displays = conf.get("displays") or {"main": {}}
+    # one emulated panel per display
+    emus = [EpdEmulator(bandwidth=a.bandwidth, latency=a.latency).start() for _ in displays]
+    fd, secrets_path = tempfile.mkstemp(suffix=".yaml")
+    os.close(fd)
+    try:
+        write_secrets(secrets_path, fake.url, fake.token, emus[0].host)
+        const.load_config(a.config, secrets_path)
+        const.CONF["displays"] = {
+            name: {**d, "host": emu.host, "clear_at_start": False}
+            for (name, d), emu in zip(displays.items(), emus)
+        }
+        const.CONF["ui_settings"]["config_reload"] = 0  # keep the overrides below
+        const.CONF["ui_settings"]["trace"] = None  # don't record the test traffic
+        for name, c in list(const.CONF["components"].items()):
+            if a.ha_only and c.get("type") != "ha_event":
+                del const.CONF["components"][name]
+            elif c.get("executor") == "process":
+                # spawned workers would re-read the real secrets.yaml
+                c["executor"] = "thread"
+        log = contextlib.nullcontext() if a.verbose else contextlib.redirect_stdout(io.StringIO())
+        with log:
+            result = asyncio.run(drive(a, fake, emus))
+    finally:
+        os.unlink(secrets_path)
+        fake.stop()
+        for emu in emus:
+            emu.stop()
+
+    if a.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    lat = result["latency_ms"]
+    print(
+        f"{result['events_sent']} events in {result['duration_s']:.1f} s "
+        f"({result['throughput_eps']:.1f}/s received, {result['dropped']} dropped)"
+        + (f", {result['timer_runs']} timer runs" if result["timer_runs"] else "")
+    )
+    print(
+        f"{result['renders']} renders, {result['coalesced']} coalesced, "
+        f"{result['superseded']} superseded, "
+        f"{result['panel_updates']} panel updates on {result['displays']} display(s) "
+        f"in {result['draw_requests']} /draw "
+        f"({result['bytes_uploaded'] / 1024:.0f} KiB)"
+    )
+    if lat:
+        print(
+            f"event → panel: p50 {lat['p50']:.0f} ms, p95 {lat['p95']:.0f} ms, "
+            f"p99 {lat['p99']:.0f} ms, max {lat['max']:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Display lists for fixed-layout components.
+
+Most tiles redraw the same rounded frame, icons and labels on every
+refresh although only a few strings change. A ``Layout`` keeps the static
+part as a cached background image, drawn once per background ``key``
+(e.g. normal / abnormal colours), and draws the changing strings as named
+``Text`` slots on top:
+
+    changed = layout.render(img, key, draw_background, {"state": Text(...)})
+
+Only slots whose content differs from the last render are restored from
+the background and redrawn. ``render`` returns their rectangles (old and
+new text extent) so the compositor marks just those dirty, or ``None``
+when the whole image was redrawn (first render, new background). Slots
+must not overlap each other.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, NamedTuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from damage import Rect
+
+
+class Text(NamedTuple):
+    xy: tuple[int, int]
+    text: str
+    font: ImageFont.FreeTypeFont
+    fill: str = "black"
+    anchor: str | None = None
+
+    def signature(self) -> tuple:
+        """What the slot looks like; fonts compare by file and size."""
+        font = (getattr(self.font, "path", None), getattr(self.font, "size", None))
+        return (self.xy, self.text, font, self.fill, self.anchor)
+
+
+class Layout:
+    def __init__(self, size: tuple[int, int], mode: str = "RGB", pad: int = 2):
+        self.size = size
+        self.mode = mode
+        self.pad = pad  # px around the text box for antialiasing
+        self.base: Image.Image | None = None
+        self._key = None
+        # slot name -> (signature, rectangle it covers)
+        self._drawn: dict[str, tuple[tuple, Rect]] = {}
+
+    def _box(self, draw: ImageDraw.ImageDraw, slot: Text) -> Rect:
+        left, top, right, bottom = draw.textbbox(
+            slot.xy, slot.text, font=slot.font, anchor=slot.anchor
+        )
+        p = self.pad
+        x, y = max(int(left) - p, 0), max(int(top) - p, 0)
+        x2 = min(int(right) + p + 1, self.size[0])
+        y2 = min(int(bottom) + p + 1, self.size[1])
+        return Rect(x, y, max(x2 - x, 0), max(y2 - y, 0))
+
+    def _restore(self, img: Image.Image, rect: Rect) -> None:
+        if rect.w and rect.h:
+            img.paste(self.base.crop((rect.x, rect.y, rect.x2, rect.y2)), (rect.x, rect.y))
+
+    def render(
+        self,
+        img: Image.Image,
+        key,
+        background: Callable[[Image.Image, ImageDraw.ImageDraw], None],
+        slots: dict[str, Text],
+    ) -> list[Rect] | None:
+        """Bring ``img`` up to date; returns the changed rectangles or None (all)."""
+        full = self.base is None or key != self._key or img.size != self.size
+        if full:
+            self.size = img.size
+            self.base = Image.new(self.mode, self.size, "white")
+            background(self.base, ImageDraw.Draw(self.base))
+            self._key = key
+            self._drawn.clear()
+            img.paste(self.base)
+        draw = ImageDraw.Draw(img)
+        changed: list[Rect] = []
+        for name in self._drawn.keys() - slots.keys():
+            _, rect = self._drawn.pop(name)
+            self._restore(img, rect)
+            changed.append(rect)
+        for name, slot in slots.items():
+            signature = slot.signature()
+            old = self._drawn.get(name)
+            if old is not None:
+                if old[0] == signature:
+                    continue
+                self._restore(img, old[1])
+                changed.append(old[1])
+            draw.text(slot.xy, slot.text, fill=slot.fill, font=slot.font, anchor=slot.anchor)
+            rect = self._box(draw, slot)
+            self._drawn[name] = (signature, rect)
+            changed.append(rect)
+        return None if full else changed
@@ -1,33 +1,132 @@
-import os, time, threading
-
+import asyncio, copy, os, signal, time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import yaml
+
+import const
+import framebuffer
+import metrics
+import profiling
+import startup
+from startup import mark
 from ha import *
 from component import *
 from send_image import http_post
+from scheduler import Scheduler
+from damage import Rect
+from display import Display
+from event_trace import TraceRecorder
+from refresh_budget import RefreshBudget
+from render_cache import PanelShadow
 
 
 class UI:
+    """Asyncio runtime: HA events, timers and panel uploads on one event loop.
+
+    Blocking work never runs on the loop itself: renders go to a bounded
+    render pool, HTTP calls (REST bootstrap, ``/draw`` uploads) to threads.
+    Each component is rendered once and its frame is composed into the
+    framebuffer of every display showing it; one upload worker per display
+    flushes everything dirty on that panel in one pass.
+    """
 
     def __init__(self):
-        if SECRETS["inkscreen"]["enable"] and SECRETS["inkscreen"]["clear_at_start"]:
-            # Clear the screen at startup if configured
-            print("Clearing the screen at startup...")
-            http_post(SECRETS["inkscreen"]["host"], "/clear")
-        #
         self.running = False
         self.ui_settings = CONF["ui_settings"]
+        self.inkscreen_enabled = SECRETS["inkscreen"].get("enable", True)
+
+        # entities exist before components; their states are fetched in run()
+        init_ha_states(fetch=False)
 
         self.components_conf = CONF["components"]
         self.components = {}
         self.ha_registry = {}
 
+        # displays: panels and the tiles each one shows (default: one panel, all tiles)
+        displays_conf = CONF.get("displays") or SECRETS["inkscreen"].get("displays")
+        if not displays_conf:
+            displays_conf = {"main": {"host": SECRETS["inkscreen"]["host"]}}
+        # display name -> the tiles it lists in its config (None: all of them)
+        self._display_tiles = {d: dconf.get("components") for d, dconf in displays_conf.items()}
+        layouts = {}
+        for dname, names in self._display_tiles.items():
+            for n in names or ():
+                if n not in self.components_conf:
+                    print(f"[!] Display {dname}: unknown component {n}, skipped")
+            layouts[dname] = self._layout(dname)
+        shown = {n for names in layouts.values() for n in names}
+
         for name in self.components_conf:
-            component = create_component(name)
-            self.components[name] = component
-            if component.component_type in ["ha_event"]:
-                self.ha_registry.update({component.entity_id: component})
-        # print(self.ha_registry)
+            if name not in shown:
+                continue
+            self.components[name] = create_component(name)
+        self._index_ha_components()
+        mark("components created")
+
+        self.render_pool = ThreadPoolExecutor(
+            self.ui_settings.get("render_workers", 2), thread_name_prefix="render"
+        )
+        self.coalesce_window = self.ui_settings.get("coalesce_window", 0.2)
+        self.displays: list[Display] = []
+        for dname, names in layouts.items():
+            dconf = displays_conf[dname]
+            display = Display(
+                dname,
+                dconf["host"],
+                (self.components[n] for n in names),
+                coalesce_window=self.coalesce_window,
+                request_overhead_px=self.ui_settings.get("request_overhead_px", 100_000),
+                clear_at_start=dconf.get(
+                    "clear_at_start", SECRETS["inkscreen"].get("clear_at_start", False)
+                ),
+                shadow=(
+                    PanelShadow(Path(f"output/cache/panel-{dname}.json"), dconf["host"])
+                    if self.ui_settings.get("shadow_panel", True)
+                    else None
+                ),
+                compressed=self.ui_settings.get("draw_compression", True),
+                shared=(
+                    Path(f"output/panel-{dname}.fb")
+                    if self.ui_settings.get("share_framebuffer", True)
+                    else None
+                ),
+                budget=RefreshBudget(
+                    busy_window=self.ui_settings.get("busy_window", 5),
+                    max_defer=self.ui_settings.get("max_defer", 120),
+                    quiet_hours=dconf.get("quiet_hours", self.ui_settings.get("quiet_hours")),
+                    clean_after=self.ui_settings.get("clean_after", 1),
+                    timezone=TIMEZONE,
+                ),
+            )
+            display.on_uploaded = self._on_uploaded
+            display.superseded = self._superseded
+            self.displays.append(display)
+        profiling.configure(
+            self.ui_settings.get("profiling", False), self.ui_settings.get("profile_top_n", 25)
+        )
 
-        self.component_timers = {}  # 存储每个组件的定时器
+        self.process_pool = None
+        self._start_process_pool()
+        self.scheduler = Scheduler(batch_window=self.ui_settings.get("batch_window", 2))
+
+        # 渲染合并: one render per component at a time
+        self._rendering: set[str] = set()
+        self._rerender: set[str] = set()
+        self._pasted_seq: dict[str, int | None] = {}  # input version composed per tile
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self.events_received = 0
+        self.renders = 0
+        self.render_coalesced = 0
+        self.stale_renders = 0  # frames dropped because newer inputs arrived meanwhile
+        self.latencies = deque(maxlen=1000)  # HA event → panel, seconds
+        # False: timer components only render when told to (trace replay)
+        self.run_timers = True
+        self.recorder: TraceRecorder | None = None  # ui_settings.trace
 
         # Home Assistant 重连相关配置
         self.ha_reconnect_interval = SECRETS["homeassistant"].get(
@@ -39,86 +138,492 @@ class UI:
         # make output directory
         os.makedirs("output", exist_ok=True)
 
-    def start(self):
+    async def run(self):
         if self.running:
             return
-
         self.running = True
 
-        for name, component in self.components.items():
-            if component.component_type in ["ha_event", "notebook", "timer"]:
-                component.callback()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # not on the main thread / not supported on this platform
+        if hasattr(signal, "SIGUSR1"):
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, profiling.toggle)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        metrics_port = self.ui_settings.get("metrics_port")
+        if metrics_port:
+            try:
+                metrics.start_server(metrics_port, self.ui_settings.get("metrics_host", "127.0.0.1"))
+                print(f"[{datetime.now():%H:%M:%S}] Metrics on :{metrics_port}/metrics")
+            except OSError as e:
+                print(f"[!] Couldn't start the metrics endpoint on :{metrics_port}: {e}")
+        snapshot_port = self.ui_settings.get("snapshot_port")
+        shared = {d.name: d.compositor.shared.path for d in self.displays if d.compositor.shared}
+        if snapshot_port and shared:
+            try:
+                framebuffer.start_server(
+                    shared, snapshot_port, self.ui_settings.get("metrics_host", "127.0.0.1")
+                )
+                print(f"[{datetime.now():%H:%M:%S}] Panel snapshots on :{snapshot_port}/<display>.png")
+            except OSError as e:
+                print(f"[!] Couldn't start the snapshot endpoint on :{snapshot_port}: {e}")
+
+        try:
+            for display in self.displays:
+                self._spawn(display.run())
+                self._spawn(display.maintain())
+
+            startup_io = [asyncio.to_thread(init_ha_states)]
+            for display in self.displays:
+                if self.inkscreen_enabled and display.clear_at_start:
+                    # Clear the screen at startup if configured
+                    print(f"Clearing {display.name} at startup...")
+                    if display.shadow is not None:
+                        display.shadow.clear()
+                    startup_io.append(asyncio.to_thread(http_post, display.host, "/clear"))
+            await asyncio.gather(*startup_io)
+            mark("Home Assistant states fetched")
+
+            await self._initial_paint()
+
+            if self.ui_settings.get("trace"):
+                self.recorder = TraceRecorder(self.ui_settings["trace"])
+                self.recorder.initial(ha_states.values())
+                print(f"[{datetime.now():%H:%M:%S}] Recording events to {self.recorder.path}")
+
+            # ha subscription
+            self._spawn(self.start_ha_subscription())
+
+            # timer for components
+            if self.run_timers:
+                self._start_component_timers()
+
+            if self.ui_settings.get("config_reload", 2):
+                self._spawn(self._watch_config(self.ui_settings["config_reload"]))
+
+            await self._stopping.wait()
+        finally:
+            self.running = False
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self.render_pool.shutdown(wait=False, cancel_futures=True)
+            if self.process_pool is not None:
+                self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.scheduler.print_stats()
+            self.print_latency_stats()
+            if profiling.enabled:
+                profiling.write_summary()
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _initial_paint(self):
+        """Render every tile concurrently, then push the panel in one pass."""
+        # cheap tiles first, they are queued on the render pool in this order
+        order = {"ha_event": 0, "notebook": 1, "timer": 2}
+        names = sorted(
+            (n for n, c in self.components.items() if c.component_type in order),
+            key=lambda n: order[self.components[n].component_type],
+        )
+        await asyncio.gather(*(self.refresh(name, upload=False) for name in names))
+        mark("all tiles rendered")
+        # one pass for the whole panel: not split up by the refresh budget
+        await asyncio.gather(*(self.upload(name, budget=False) for name in names))
+        mark("panel painted")
+        startup.report()
+
+    # ───────────────────────── render / upload ─────────────────────────
+
+    async def render(self, name: str) -> bool:
+        """Render a component with its configured executor."""
+        ok = False
+        try:
+            with metrics.span("render", name):
+                ok = await self._render(name)
+        finally:
+            result = "failed" if ok is False else "unchanged" if ok == UNCHANGED else "ok"
+            metrics.RENDERS.inc(component=name, result=result)
+        return ok
+
+    async def _render(self, name: str) -> bool:
+        component = self.components[name]
+        if component.executor == "inline":
+            return component.render()
+        loop = asyncio.get_running_loop()
+        if component.executor == "process":
+            result = await loop.run_in_executor(
+                self.process_pool, render_to_shared_memory, name
+            )
+            if result is None:
+                return False
+            if result == UNCHANGED:
+                return UNCHANGED
+            component.frame = frame_from_shared_memory(*result)
+            component.add_damage(None)
+            return True
+        return await loop.run_in_executor(self.render_pool, component.render)
+
+    async def refresh(
+        self, name: str, received: float | None = None, upload: bool = True
+    ) -> bool:
+        """Render a component, compose it into the framebuffer and upload it.
+
+        Renders of one component never overlap: requests arriving while it
+        renders are coalesced into a single re-render with the newest state.
+        Returns whether a new frame was composed.
+        """
+        if name in self._rendering:
+            self._rerender.add(name)
+            self.render_coalesced += 1
+            metrics.SKIPPED.inc(component=name, reason="coalesced")
+            return False
+        if received is not None:
+            metrics.observe("queue", time.monotonic() - received, name)
+        self._rendering.add(name)
+        changed = False
+        try:
+            while True:
+                self._rerender.discard(name)
+                self.renders += 1
+                try:
+                    ok = await self.render(name)
+                except Exception as e:
+                    print(f"[!] {name}: render failed: {e}")
+                    ok = False
+                changed = changed or (ok is not False and ok != UNCHANGED)
+                component = self.components.get(name)
+                stale = ok is not False and component is not None and component.stale
+                if name not in self._rerender and not stale:
+                    break
+                # drawn from a state that is already outdated: don't show it
+                self.stale_renders += 1
+                metrics.SKIPPED.inc(component=name, reason="superseded")
+        finally:
+            self._rendering.discard(name)
+        component = self.components.get(name)
+        if not changed or component is None or component.frame is None:
+            return False  # nothing new, or the tile was removed / rebuilt meanwhile
+        self._pasted_seq[name] = component.frame_seq
+        damage = component.take_damage()
+        for display in self.displays:
+            if display.shows(name):
+                display.paste(component, damage)
+        if upload:
+            await self.upload(name, received)
+        return True
+
+    async def upload(self, name: str, received: float | None = None, budget: bool = True):
+        """Queue an upload on every display showing a component; wait for all."""
+        if not self.inkscreen_enabled:
+            return
+        await asyncio.gather(
+            *(d.upload(name, received, budget) for d in self.displays if d.shows(name))
+        )
+
+    def _superseded(self, name: str) -> bool:
+        """A render from newer inputs is under way; its frame will replace the composed one."""
+        component = self.components.get(name)
+        if name not in self._rendering or component is None:
+            return False
+        seq = component.input_seq()
+        return seq is not None and seq != self._pasted_seq.get(name)
 
-        # ha subscription thread
-        ha_thread = threading.Thread(target=self.start_ha_subscription, daemon=True)
-        ha_thread.start()
+    def _on_uploaded(self, display: Display, name: str, received: float | None):
+        if received is None:
+            return
+        latency = time.monotonic() - received
+        self.latencies.append(latency)
+        metrics.observe("total", latency, name)
+        print(
+            f"[{datetime.now():%H:%M:%S}] {name}: event → {display.name} {latency * 1000:.0f} ms"
+        )
 
-        # timer for components
-        self._start_component_timers()
+    @property
+    def coalesced(self) -> int:
+        """Renders and uploads merged into one already in flight."""
+        return self.render_coalesced + sum(d.coalesced for d in self.displays)
+
+    @property
+    def superseded(self) -> int:
+        """Frames dropped or held back because newer inputs were already there."""
+        return self.stale_renders + sum(d.stale_uploads for d in self.displays)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._rendering) or any(d.busy for d in self.displays)
+
+    def latency_stats(self) -> dict:
+        """Percentiles of HA event → panel latency in milliseconds."""
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000
+
+        return {
+            "count": len(ordered),
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": ordered[-1] * 1000,
+            "coalesced": self.coalesced,
+        }
+
+    def print_latency_stats(self):
+        s = self.latency_stats()
+        if s:
+            print(
+                f"[{datetime.now():%H:%M:%S}] Event → panel latency over {s['count']} updates: "
+                f"p50 {s['p50']:.0f} ms, p95 {s['p95']:.0f} ms, max {s['max']:.0f} ms "
+                f"({s['coalesced']} coalesced)"
+            )
+
+    # ───────────────────────────── timers ──────────────────────────────
 
     def _start_component_timers(self):
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Starting component timers...")
-        for name, component in self.components.items():
-            if component.component_type == "timer":
-                print(
-                    f"[{datetime.now().strftime('%H:%M:%S')}] Scheduling timer for {name}"
-                )
-                self._schedule_component_refresh(name, component)
-
-    def _schedule_component_refresh(self, component_name, component):
-        """为指定组件安排定时刷新"""
-        if not self.running:
+        for name in self.components:
+            self._schedule(name)
+        self._spawn(self.scheduler.run())
+        self.scheduler.print_stats()
+
+    def _schedule(self, name: str):
+        component = self.components[name]
+        if component.component_type != "timer":
             return
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Scheduling timer for {name}")
+        self.scheduler.add(
+            name,
+            partial(self._timer_fired, name),
+            interval=getattr(component, "refresh_interval", 600),
+            upload=partial(self.upload, name),
+            align=component.align,
+            offset=component.align_offset,
+        )
+        self._schedule_extra(name)
+
+    def _schedule_extra(self, name: str):
+        # one-off refresh asked for by the last render (e.g. at sunset)
+        when = getattr(self.components.get(name), "refresh_at", None)
+        if when is not None:
+            self.scheduler.run_at(name, when)
+
+    async def _timer_fired(self, name: str) -> bool:
+        if self.recorder is not None:
+            self.recorder.timer(name)
+        try:
+            return await self.refresh(name, upload=False)
+        finally:
+            self._schedule_extra(name)
+
+    # ─────────────────────────── config reload ─────────────────────────
+
+    def _layout(self, dname: str) -> list[str]:
+        """The configured tiles a display shows, in config order."""
+        names = self._display_tiles[dname] or list(self.components_conf)
+        return [n for n in names if n in self.components_conf]
+
+    def _index_ha_components(self):
+        self.ha_registry.clear()
+        for component in self.components.values():
+            if component.component_type in ["ha_event"]:
+                self.ha_registry[component.entity_id] = component
+
+    def _start_process_pool(self):
+        # only started when some component asks for executor: process
+        if any(c.executor == "process" for c in self.components.values()):
+            self.process_pool = ProcessPoolExecutor(
+                self.ui_settings.get("process_workers", 1),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_render_worker,
+            )
+
+    async def _watch_config(self, interval: float):
+        """Poll config.yaml and apply edits without a restart."""
+        path = const.config_path()
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if current == mtime:
+                continue
+            mtime = current
+            try:
+                await self.reload_config(path)
+            except Exception as e:
+                print(f"[!] Applying {path} failed: {e}")
+
+    async def reload_config(self, path: Path) -> set[str]:
+        """Diff a changed config.yaml against the running one and apply it.
+
+        Only added, removed or edited tiles are rebuilt, re-rendered and
+        uploaded; the rectangles removed or moved tiles leave are cleared.
+        ``ui_settings``, ``locale`` and ``displays`` still need a restart.
+        Returns the names of the rebuilt tiles.
+        """
+        try:
+            conf = yaml.safe_load(path.read_text())
+            conf["components"], conf["entities"]
+        except (OSError, yaml.YAMLError, KeyError, TypeError) as e:
+            print(f"[!] {path} not reloaded: {e}")
+            return set()
+        for key in ("ui_settings", "locale", "displays"):
+            if conf.get(key) != CONF.get(key):
+                print(f"[!] {path}: changes to {key} apply after a restart")
+            if key in CONF:
+                conf[key] = CONF[key]
+            else:
+                conf.pop(key, None)
+        old_components = copy.deepcopy(CONF["components"])
+        old_entities = copy.deepcopy(CONF_ENTITIES)
+        const.update_config(conf)
+
+        # entities: new ones are fetched, edited ones re-read their settings
+        entities = {
+            eid
+            for eid in old_entities.keys() | CONF_ENTITIES.keys()
+            if old_entities.get(eid) != CONF_ENTITIES.get(eid)
+        }
+        for eid in entities:
+            if eid not in CONF_ENTITIES:
+                ha_states.pop(eid, None)
+            elif eid in ha_states:
+                ha_states[eid].configure()
+        added_ids = [eid for eid in WATCHED if eid not in ha_states]
+        init_ha_states(fetch=False)
+        if added_ids:
+            await asyncio.to_thread(fetch_ha_states, added_ids)
+
+        new_components = CONF["components"]
+        removed = old_components.keys() - new_components.keys()
+        rebuilt = {
+            n for n in new_components if old_components.get(n) != new_components[n]
+        } | {
+            n
+            for n, c in self.components.items()
+            if n in new_components and getattr(c, "entity_id", None) in entities
+        }
+        layouts = {d.name: self._layout(d.name) for d in self.displays}
+        shown = {n for names in layouts.values() for n in names}
+        rebuilt = {n for n in rebuilt if n in shown} | (shown - self.components.keys())
+        if not removed and not rebuilt:
+            if entities:
+                print(f"[{datetime.now():%H:%M:%S}] {path} reloaded: entities updated")
+            return set()
+
+        rect = lambda c: Rect(c.x_px, c.y_px, c.width_px, c.height_px)
+        old_rects = {n: rect(c) for n, c in self.components.items()}
+        for name in (removed | rebuilt) & self.components.keys():
+            self.scheduler.remove(name)
+            del self.components[name]
+        for name in sorted(rebuilt):
+            try:
+                self.components[name] = create_component(name)
+            except Exception as e:
+                print(f"[!] {name}: couldn't create component: {e}")
+                shown.discard(name)
+        for name in list(self.components):
+            if name not in shown:
+                del self.components[name]
+        self._index_ha_components()
+
+        cleared = []
+        for display in self.displays:
+            names = [n for n in layouts[display.name] if n in self.components]
+            vacated = []
+            for name in display.names:
+                if name not in names or (
+                    name in rebuilt and rect(self.components[name]) != old_rects[name]
+                ):
+                    vacated.append(old_rects[name])
+                    cleared.append((display, name))
+                if name in rebuilt or name not in names:
+                    display.forget(name)
+            display.relayout((self.components[n] for n in names), vacated)
+
+        process = lambda c: c.get("executor") == "process"
+        if any(process(old_components.get(n, {})) for n in removed | rebuilt):
+            # workers keep the tiles they built; fresh ones read the new config.yaml
+            if self.process_pool is not None:
+                self.process_pool.shutdown(wait=False)
+            self.process_pool = None
+        if self.process_pool is None:
+            self._start_process_pool()
+
+        rebuilt &= self.components.keys()
+        print(
+            f"[{datetime.now():%H:%M:%S}] {path} reloaded: "
+            f"{len(rebuilt)} tile(s) rebuilt, {len(removed)} removed"
+        )
+        for name in rebuilt:
+            self._schedule(name)
+        await asyncio.gather(
+            *(self.refresh(name) for name in rebuilt),
+            *(d.upload(name) for d, name in cleared if self.inkscreen_enabled),
+        )
+        return rebuilt
 
-        def refresh_callback():
-            if self.running:
-                component.callback()
-                self._schedule_component_refresh(component_name, component)
-
-        interval = getattr(component, "refresh_interval", 600)
-        timer = threading.Timer(interval, refresh_callback)
-        timer.daemon = True
-        timer.start()
+    # ─────────────────────────── Home Assistant ────────────────────────
 
-        self.component_timers[component_name] = timer
+    def _on_ha_connected(self):
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Successfully connected to Home Assistant WebSocket"
+        )
+        self.ha_connection_active = True
+        metrics.RECONNECTS.inc()
 
-    def start_ha_subscription(self):
+    async def start_ha_subscription(self):
         """启动 Home Assistant WebSocket 订阅，带有重连功能"""
         while self.running:
             try:
-                current_time = time.time()
-
                 # 检查是否需要等待重连间隔
-                if (
-                    current_time - self.last_ha_connection_attempt
-                ) < self.ha_reconnect_interval:
-                    time.sleep(5)  # 每5秒检查一次
+                wait = (
+                    self.last_ha_connection_attempt
+                    + self.ha_reconnect_interval
+                    - time.time()
+                )
+                if wait > 0:
+                    await asyncio.sleep(wait)
                     continue
 
-                self.last_ha_connection_attempt = current_time
+                self.last_ha_connection_attempt = time.time()
                 print(
                     f"[{datetime.now().strftime('%H:%M:%S')}] Attempting to connect to Home Assistant WebSocket..."
                 )
 
-                with WebsocketClient(WS_URL, TOKEN) as ws:
-                    print(
-                        f"[{datetime.now().strftime('%H:%M:%S')}] Successfully connected to Home Assistant WebSocket"
-                    )
-                    self.ha_connection_active = True
-
-                    with ws.listen_events("state_changed") as events:
-                        for ev in events:
-                            if not self.running:
-                                break
-
-                            data = ev.data
-                            eid = data["entity_id"]
-                            if eid in WATCHED:
-                                state_changed = update_entity_from_state_changed(data)
-                                if state_changed and (eid in self.ha_registry):
-                                    component = self.ha_registry[eid]
-                                    component.callback()
+                async for data, received in listen_state_changed(self._on_ha_connected):
+                    self.events_received += 1
+                    metrics.EVENTS.inc()
+                    eid = data["entity_id"]
+                    if eid in WATCHED:
+                        if self.recorder is not None:
+                            self.recorder.event(data, received, ha_states[eid].keep)
+                        state_changed = update_entity_from_state_changed(data)
+                        if state_changed and (eid in self.ha_registry):
+                            component = self.ha_registry[eid]
+                            self._spawn(self.refresh(component.name, received))
+                self.ha_connection_active = False
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 self.ha_connection_active = False
                 print(f"[!] Home Assistant WebSocket connection error: {e}")
@@ -140,21 +645,13 @@ class UI:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Stopping UI manager...")
         self.running = False
         self.ha_connection_active = False
-        # ha_thread 是在 start 方法中作为守护线程启动的，无需显式停止
-        # Cancel all timers
-        for timer in self.component_timers.values():
-            timer.cancel()
-        self.component_timers.clear()
+        self._stopping.set()
 
 
 if __name__ == "__main__":
+    mark("modules imported")
     ui_manager = UI()
-    ui_manager.start()
-
     try:
-        # keey the main thread alive
-        while True:
-            time.sleep(1)
+        asyncio.run(ui_manager.run())
     except KeyboardInterrupt:
         print("Exiting ...")
-        ui_manager.stop()
@@ -0,0 +1,241 @@
+"""Timing spans, counters and histograms with a Prometheus endpoint.
+
+Each stage of an update is measured with a span::
+
+    with metrics.span("render", component=name):
+        component.render()
+
+    with metrics.span("draw") as s:
+        http_post(host, "/draw", data=payload)
+        s.bytes, s.patches = len(payload), 1
+
+A span's duration goes into the ``inkscreen_stage_seconds`` histogram
+(labelled by stage and component); its bytes and patches go into counters.
+The last spans are also kept for inspection. ``start_server`` serves
+everything in Prometheus text format on ``/metrics`` and the recent spans
+as JSON on ``/spans``.
+
+Stages: ``queue`` (HA event received → render start), ``render``,
+``encode``, ``draw`` (one ``/draw`` patch), ``upload`` (one panel pass)
+and ``total`` (HA event received → on panel).
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_metrics: dict[str, "Metric"] = {}
+
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        with _lock:
+            _metrics[name] = self
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+    def expose(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def expose(self) -> list[str]:
+        lines = super().expose()
+        for key, v in sorted(self.values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, key)} {v:g}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self.series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            counts, _ = s = self.series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            s[1] += value
+
+    def expose(self) -> list[str]:
+        lines = super().expose()
+        for key, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _label_str(self.labels, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {cumulative}")
+        return lines
+
+
+# ─────────────────────────── metrics ────────────────────────────
+
+STAGE_SECONDS = Histogram(
+    "inkscreen_stage_seconds", "Duration of one update stage.", ("stage", "component")
+)
+STAGE_BYTES = Counter(
+    "inkscreen_stage_bytes_total", "Bytes sent to the panel per stage.", ("stage", "component")
+)
+STAGE_PATCHES = Counter(
+    "inkscreen_stage_patches_total", "/draw patches sent per stage.", ("stage", "component")
+)
+EVENTS = Counter("inkscreen_ha_events_total", "state_changed events received.")
+RENDERS = Counter("inkscreen_renders_total", "Component renders.", ("component", "result"))
+SKIPPED = Counter(
+    "inkscreen_renders_skipped_total",
+    "Renders skipped: coalesced into another render or a missed timer slot.",
+    ("component", "reason"),
+)
+DRAW_PATCHES = Counter(
+    "inkscreen_draw_patches_total", "/draw patches by body encoding.", ("encoding",)
+)
+DRAW_BYTES_SAVED = Counter(
+    "inkscreen_draw_bytes_saved_total",
+    "Payload bytes not sent thanks to /draw body compression.",
+    ("encoding",),
+)
+DEFERRED = Counter(
+    "inkscreen_uploads_deferred_total",
+    "Tile uploads held back by the refresh budget.",
+    ("component", "reason"),
+)
+REFRESHES = Counter(
+    "inkscreen_tile_refreshes_total", "Tile refreshes per panel.", ("display", "component")
+)
+UPLOAD_FAILURES = Counter("inkscreen_upload_failures_total", "Failed panel update passes.")
+RECONNECTS = Counter("inkscreen_ws_reconnects_total", "Home Assistant WebSocket (re)connects.")
+
+RECENT: deque["Span"] = deque(maxlen=500)
+
+
+@dataclass
+class Span:
+    stage: str
+    component: str = ""
+    start: float = field(default_factory=time.time)
+    duration: float = 0.0
+    bytes: int = 0
+    patches: int = 0
+
+
+@contextmanager
+def span(stage: str, component: str = ""):
+    """Time a block and record it as one ``stage`` span."""
+    s = Span(stage, component)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.duration = time.perf_counter() - t0
+        record(s)
+
+
+def observe(stage: str, seconds: float, component: str = "", **fields) -> None:
+    """Record a span whose duration was measured elsewhere."""
+    record(Span(stage, component, time.time() - seconds, seconds, **fields))
+
+
+def record(s: Span) -> None:
+    STAGE_SECONDS.observe(s.duration, stage=s.stage, component=s.component)
+    if s.bytes:
+        STAGE_BYTES.inc(s.bytes, stage=s.stage, component=s.component)
+    if s.patches:
+        STAGE_PATCHES.inc(s.patches, stage=s.stage, component=s.component)
+    RECENT.append(s)
+
+
+def expose() -> str:
+    """All metrics in Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_metrics.values())
+    lines = []
+    for m in metrics:
+        lines += m.expose()
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────── server ─────────────────────────────
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = expose().encode()
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/spans":
+            body = json.dumps([asdict(s) for s in list(RECENT)]).encode()
+            ctype = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` and ``/spans`` from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
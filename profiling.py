@@ -0,0 +1,127 @@
+"""On-demand cProfile hooks for component renders and panel uploads.
+
+Functions decorated with ``@profiled(label)`` run under ``cProfile`` while
+profiling is on. The profiles are accumulated per label (the component
+name for renders) and written to ``output/profiles/<label>.prof`` (open
+with ``python -m pstats`` or snakeviz). ``summary.txt`` lists the calls per
+label and the top-N hottest functions over everything.
+
+Switch it on with ``ui_settings.profiling: true`` or toggle it at runtime
+with ``kill -USR1 <pid>``. While off, the decorator costs one attribute
+check per call.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+enabled = False
+top_n = 25
+out_dir = Path("output/profiles")
+summary_interval = 10.0  # s between summary.txt rewrites
+
+_lock = threading.Lock()
+_local = threading.local()
+_stats: dict[str, pstats.Stats] = {}
+_calls: dict[str, tuple[int, float]] = {}  # label -> (calls, seconds)
+_last_summary = 0.0
+
+
+def configure(enable: bool, n: int = 25, directory: str | Path | None = None) -> None:
+    global enabled, top_n, out_dir
+    top_n = n
+    if directory is not None:
+        out_dir = Path(directory)
+    enabled = bool(enable)
+
+
+def toggle() -> bool:
+    """Flip profiling on/off; writes the summary when switching off."""
+    global enabled
+    enabled = not enabled
+    if not enabled:
+        write_summary()
+    print(
+        f"[{datetime.now():%H:%M:%S}] Profiling {'on' if enabled else f'off, see {out_dir}/summary.txt'}"
+    )
+    return enabled
+
+
+def profiled(label: str | Callable[..., str]):
+    """Profile calls of the decorated function under ``label``.
+
+    ``label`` may be a callable receiving the call's arguments, e.g.
+    ``lambda self: self.name``.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled or getattr(_local, "active", False):
+                return fn(*args, **kwargs)
+            key = label(*args) if callable(label) else label
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:  # another profiler is active (3.12+)
+                return fn(*args, **kwargs)
+            _local.active = True
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.disable()
+                _local.active = False
+                _record(key, prof, time.perf_counter() - t0)
+
+        return wrapper
+
+    return decorator
+
+
+def _record(key: str, prof: cProfile.Profile, seconds: float) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        if key in _stats:
+            _stats[key].add(prof)
+        else:
+            _stats[key] = pstats.Stats(prof)
+        calls, total = _calls.get(key, (0, 0.0))
+        _calls[key] = (calls + 1, total + seconds)
+        _stats[key].dump_stats(out_dir / f"{_safe(key)}.prof")
+        due = time.monotonic() - _last_summary >= summary_interval
+    if due:
+        write_summary()
+
+
+def _safe(key: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+
+
+def write_summary() -> Path | None:
+    """Write calls per label and the top-N functions by own time."""
+    global _last_summary
+    with _lock:
+        if not _stats:
+            return None
+        _last_summary = time.monotonic()
+        lines = [f"Profile summary {datetime.now():%Y-%m-%d %H:%M:%S}", ""]
+        lines.append(f"{'label':<32}{'calls':>8}{'total s':>10}{'mean ms':>10}")
+        for key, (calls, total) in sorted(_calls.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{key:<32}{calls:>8}{total:>10.2f}{total / calls * 1e3:>10.1f}")
+        buf = io.StringIO()
+        merged = pstats.Stats(stream=buf)
+        merged.add(*_stats.values())
+        merged.sort_stats("tottime").print_stats(top_n)
+        lines += ["", f"Top {top_n} functions by own time:", buf.getvalue()]
+    path = out_dir / "summary.txt"
+    path.write_text("\n".join(lines))
+    return path
@@ -0,0 +1,125 @@
+"""Per-panel refresh budget: rate limits, priorities and clean refreshes.
+
+E-ink partial refreshes are slow and leave ghosting that builds up with
+every update of the same area. For each display the budget
+
+* counts the refreshes of every tile since the last full clean refresh,
+* holds back a tile that was redrawn less than its
+  ``min_refresh_interval`` ago,
+* defers ``priority: low`` tiles while higher priority tiles are being
+  updated (for ``busy_window`` seconds after them), at most ``max_defer``,
+* asks for one full clean refresh (``/clear`` and a repaint) per
+  ``quiet_hours`` window once some tile was refreshed ``clean_after`` times.
+
+A held tile stays dirty and queued; newer frames of it merge into the one
+upload it gets when its wait is over.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+LOW = PRIORITIES["low"]
+
+
+def parse_quiet_hours(value: str | None) -> tuple[int, int] | None:
+    """``"02:00-05:30"`` → minutes after midnight (start, end); may wrap."""
+    if not value:
+        return None
+    start, end = (
+        int(h) * 60 + int(m) for h, m in (part.strip().split(":") for part in value.split("-"))
+    )
+    return start, end
+
+
+class RefreshBudget:
+    def __init__(
+        self,
+        busy_window: float = 5.0,
+        max_defer: float = 120.0,
+        quiet_hours: str | None = None,
+        clean_after: int = 1,
+        timezone: str = "America/Los_Angeles",
+    ):
+        self.busy_window = busy_window
+        self.max_defer = max_defer
+        self.quiet = parse_quiet_hours(quiet_hours)
+        self.clean_after = clean_after
+        self.tz = ZoneInfo(timezone)
+        # name -> (priority rank, min seconds between refreshes)
+        self.policy: dict[str, tuple[int, float]] = {}
+        self.counts: dict[str, int] = {}  # refreshes since the last clean
+        self.last: dict[str, float] = {}  # monotonic time of the last refresh
+        self._last_busy = -math.inf  # last refresh of a tile above low priority
+        self._deferred: dict[str, float] = {}  # name -> first deferral
+        self._cleaned_window = None  # start date of the quiet window last cleaned
+
+    def set_policy(self, name: str, priority: str = "normal", min_interval: float = 0.0) -> None:
+        if priority not in PRIORITIES:
+            print(f"[!] {name}: unknown priority {priority!r}, using normal")
+            priority = "normal"
+        self.policy[name] = (PRIORITIES[priority], float(min_interval or 0))
+
+    def wait(self, name: str, batch: list[str], now: float) -> tuple[float, str]:
+        """Seconds ``name`` has to wait before its next refresh, and why.
+
+        ``batch`` are the tiles asking to be uploaded in the same pass.
+        """
+        rank, min_interval = self.policy.get(name, (PRIORITIES["normal"], 0.0))
+        wait, reason = 0.0, ""
+        last = self.last.get(name)
+        if last is not None and last + min_interval > now:
+            wait, reason = last + min_interval - now, "rate_limited"
+        if rank == LOW:
+            if any(self.policy.get(n, (0,))[0] < LOW for n in batch):
+                busy = self.busy_window
+            else:
+                busy = self._last_busy + self.busy_window - now
+            started = self._deferred.setdefault(name, now)
+            busy = min(busy, started + self.max_defer - now)
+            if busy > wait:
+                wait, reason = busy, "busy"
+        if wait <= 0:
+            self._deferred.pop(name, None)
+            return 0.0, ""
+        return wait, reason
+
+    def refreshed(self, names: list[str], now: float) -> None:
+        for name in names:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.last[name] = now
+            self._deferred.pop(name, None)
+        if any(self.policy.get(n, (0,))[0] < LOW for n in names):
+            self._last_busy = now
+
+    # ─────────────────────────── clean refresh ──────────────────────
+
+    def _quiet_window(self, now: datetime):
+        """Start date of the quiet window ``now`` is in, or None."""
+        if self.quiet is None:
+            return None
+        start, end = self.quiet
+        minute = now.hour * 60 + now.minute
+        if start <= end:
+            return now.date() if start <= minute < end else None
+        if minute >= start:
+            return now.date()
+        if minute < end:
+            return now.date() - timedelta(days=1)
+        return None
+
+    def clean_due(self, now: datetime | None = None) -> bool:
+        window = self._quiet_window(now or datetime.now(self.tz))
+        return (
+            window is not None
+            and window != self._cleaned_window
+            and max(self.counts.values(), default=0) >= self.clean_after
+        )
+
+    def cleaned(self, now: datetime | None = None) -> None:
+        now = now or datetime.now(self.tz)
+        self._cleaned_window = self._quiet_window(now) or now.date()
+        self.counts.clear()
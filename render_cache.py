@@ -0,0 +1,109 @@
+"""Content-addressed render cache and shadow panel state.
+
+Components whose output depends only on their configuration (class
+attribute or config key ``deterministic: true``, e.g. notebooks) are keyed
+by a hash of their config, geometry, the files they draw from and the
+rendering code. The panel-ready 4-bit buffer is stored under
+``output/cache/render/<key>.2ppB``; on a hit ``render()`` loads it instead
+of drawing.
+
+``PanelShadow`` remembers a digest of the frame each tile last showed on
+a panel, persisted per display, so a tile whose frame is already on the
+panel (e.g. after a restart) is composed but not uploaded again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable
+
+from PIL import Image
+
+from send_image import pack_4bit, unpack_4bit
+
+CACHE_DIR = Path("output/cache/render")
+_CODE = Path(__file__).with_name("component.py")
+
+
+def _file_digest(path: Path, h) -> None:
+    try:
+        h.update(path.read_bytes())
+    except OSError:
+        h.update(b"missing")
+
+
+def content_key(conf: dict, assets: Iterable[str] = ()) -> str:
+    """Hash of a JSON-able config plus the contents of the files it uses."""
+    h = hashlib.sha256(json.dumps(conf, sort_keys=True, default=str).encode())
+    paths = set(assets)
+    for value in conf.get("params", {}).values():
+        if isinstance(value, str) and os.path.isfile(value):
+            paths.add(value)
+    for path in sorted(paths):
+        h.update(path.encode())
+        _file_digest(Path(path), h)
+    _file_digest(_CODE, h)
+    return h.hexdigest()[:32]
+
+
+def load(key: str, width: int, height: int) -> Image.Image | None:
+    try:
+        packed = (CACHE_DIR / f"{key}.2ppB").read_bytes()
+    except OSError:
+        return None
+    if len(packed) * 2 != width * height:
+        return None
+    return Image.frombytes("L", (width, height), bytes(unpack_4bit(packed)))
+
+
+def store(key: str, frame: Image.Image) -> Image.Image:
+    """Cache a frame; returns it as a later ``load`` will (4-bit gray)."""
+    packed = pack_4bit(frame.convert("L").tobytes())
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / f"{key}.2ppB"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(packed)
+    os.replace(tmp, path)
+    return Image.frombytes("L", frame.size, bytes(unpack_4bit(packed)))
+
+
+def frame_digest(frame: Image.Image) -> str:
+    return hashlib.blake2b(frame.tobytes(), digest_size=16).hexdigest()
+
+
+class PanelShadow:
+    """What each tile currently shows on one panel, as frame digests."""
+
+    def __init__(self, path: Path, host: str):
+        self.path = path
+        self.host = host
+        self.tiles: dict[str, str] = {}
+        try:
+            saved = json.loads(path.read_text())
+            if saved.get("host") == host:
+                self.tiles = saved["tiles"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def shows(self, name: str, digest: str) -> bool:
+        return self.tiles.get(name) == digest
+
+    def update(self, tiles: dict[str, str]) -> None:
+        self.tiles.update(tiles)
+        self.save()
+
+    def clear(self) -> None:
+        self.tiles.clear()
+        self.save()
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"host": self.host, "tiles": self.tiles}))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[!] Couldn't save panel state {self.path}: {e}")
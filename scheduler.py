@@ -0,0 +1,229 @@
+"""Central scheduler for periodic component refreshes.
+
+A coroutine keeps a heap of jobs ordered by their next run time. Jobs that
+fall due together (within ``batch_window`` seconds) form a batch: their
+render coroutines run concurrently (the caller decides which executor does
+the work), then their upload coroutines are awaited back to back in a
+single pass, so the panel sees one burst of writes instead of interleaved
+ones.
+
+Runs are scheduled from the previous *planned* time, not from when the
+render finished, so refresh times do not drift. With ``align`` a job runs
+on wall-clock multiples of its interval (e.g. every :00 and :30).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+import metrics
+
+
+@dataclass
+class Job:
+    name: str
+    render: Callable[[], Awaitable[object]]
+    upload: Optional[Callable[[], Awaitable[object]]]
+    interval: float
+    align: bool = False
+    offset: float = 0.0
+
+    next_run: float = 0.0
+    running: bool = False
+    runs: int = 0
+    skipped: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    last_duration: float = 0.0
+    _cancelled: bool = field(default=False, repr=False)
+
+    def first_run(self, now: float) -> float:
+        if not self.align:
+            return now + self.interval
+        return self._aligned_after(now)
+
+    def following_run(self, planned: float, now: float) -> float:
+        """Next slot after ``planned``, skipping slots already in the past."""
+        nxt = planned + self.interval
+        if nxt <= now:
+            missed = int((now - nxt) // self.interval) + 1
+            self.skipped += missed
+            metrics.SKIPPED.inc(missed, component=self.name, reason="missed")
+            nxt += missed * self.interval
+        return self._aligned_after(nxt - 1e-6) if self.align else nxt
+
+    def _aligned_after(self, t: float) -> float:
+        k = (t - self.offset) // self.interval + 1
+        return k * self.interval + self.offset
+
+
+class Scheduler:
+    def __init__(self, batch_window: float = 1.0):
+        self.batch_window = batch_window
+        self.jobs: dict[str, Job] = {}
+        self._heap: list[tuple[float, int, Job]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._batches: set[asyncio.Task] = set()
+
+    def add(
+        self,
+        name: str,
+        render: Callable[[], Awaitable[object]],
+        interval: float,
+        upload: Optional[Callable[[], Awaitable[object]]] = None,
+        align: bool = False,
+        offset: float = 0.0,
+    ) -> Job:
+        job = Job(name, render, upload, float(interval), align, float(offset))
+        old = self.jobs.pop(name, None)
+        if old is not None:
+            old._cancelled = True
+        job.next_run = job.first_run(time.time())
+        self.jobs[name] = job
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+        self._wakeup.set()
+        return job
+
+    def run_at(self, name: str, when: float) -> None:
+        """Run a job once at ``when`` if that comes before its next run.
+
+        The interval then continues from ``when``.
+        """
+        job = self.jobs.get(name)
+        if job is None or when >= job.next_run:
+            return
+        job.next_run = max(when, time.time())
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+        self._wakeup.set()
+
+    def remove(self, name: str) -> None:
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            job._cancelled = True
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """Run jobs until cancelled; in-flight batches are cancelled too."""
+        try:
+            while True:
+                await self._run_due(await self._pop_due())
+        finally:
+            for task in self._batches:
+                task.cancel()
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    # ─────────────────────────── loop ────────────────────────────
+
+    async def _pop_due(self) -> list[Job]:
+        """Wait for the next due job; return it with every job due alongside it."""
+        while True:
+            while self._heap and self._stale(self._heap[0]):
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            wait = self._heap[0][0] - time.time()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            horizon = time.time() + self.batch_window
+            batch = []
+            while self._heap and self._heap[0][0] <= horizon:
+                entry = heapq.heappop(self._heap)
+                if not self._stale(entry):
+                    batch.append(entry[2])
+            return batch
+
+    @staticmethod
+    def _stale(entry: tuple[float, int, Job]) -> bool:
+        # removed job, or a slot replaced by run_at()
+        t, _, job = entry
+        return job._cancelled or t != job.next_run
+
+    async def _run_due(self, batch: list[Job]) -> None:
+        now = time.time()
+        runnable = []
+        for job in batch:
+            planned = job.next_run
+            job.next_run = job.following_run(planned, now)
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+            if job.running:
+                # previous run still busy: never stack renders of one job
+                job.skipped += 1
+                metrics.SKIPPED.inc(component=job.name, reason="busy")
+                continue
+            job.running = True
+            job.last_lag = max(now - planned, 0.0)
+            job.max_lag = max(job.max_lag, job.last_lag)
+            runnable.append(job)
+        if runnable:
+            task = asyncio.create_task(self._run_batch(runnable))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _render(self, job: Job) -> bool:
+        t = time.perf_counter()
+        try:
+            ok = await job.render()
+        except Exception as e:
+            print(f"[!] {job.name}: scheduled render failed: {e}")
+            ok = False
+        job.last_duration = time.perf_counter() - t
+        return ok is not False
+
+    async def _run_batch(self, jobs: list[Job]) -> None:
+        try:
+            results = await asyncio.gather(*(self._render(job) for job in jobs))
+            # one upload pass for the whole batch
+            for job, ok in zip(jobs, results):
+                if ok and job.upload is not None:
+                    try:
+                        await job.upload()
+                    except Exception as e:
+                        print(f"[!] {job.name}: scheduled upload failed: {e}")
+                job.runs += 1
+                print(
+                    f"[{datetime.now():%H:%M:%S}] {job.name}: lag {job.last_lag * 1000:.0f} ms, "
+                    f"render {job.last_duration:.2f} s, next at {datetime.fromtimestamp(job.next_run):%H:%M:%S}"
+                )
+        finally:
+            for job in jobs:
+                job.running = False
+
+    # ────────────────────────── stats ────────────────────────────
+
+    def stats(self) -> dict[str, dict]:
+        """Per-job schedule and lag statistics."""
+        return {
+            name: {
+                "next_run": datetime.fromtimestamp(job.next_run).isoformat(timespec="seconds"),
+                "interval": job.interval,
+                "aligned": job.align,
+                "runs": job.runs,
+                "skipped": job.skipped,
+                "last_lag_ms": round(job.last_lag * 1000, 1),
+                "max_lag_ms": round(job.max_lag * 1000, 1),
+                "last_render_s": round(job.last_duration, 3),
+            }
+            for name, job in self.jobs.items()
+        }
+
+    def print_stats(self) -> None:
+        print(f"[{datetime.now():%H:%M:%S}] Scheduler:")
+        for name, s in self.stats().items():
+            print(
+                f"    {name:<24} next {s['next_run'][11:]}  every {s['interval']:.0f}s"
+                f"{' aligned' if s['aligned'] else ''}  runs {s['runs']}  skipped {s['skipped']}"
+                f"  lag {s['last_lag_ms']:.0f}/{s['max_lag_ms']:.0f} ms"
+            )
@@ -10,27 +10,51 @@
 
 The FW’s single endpoint `/draw` is used; a header `bw: 1/0` tells it which
 function to call.
+
+* Bodies are sent zlib- or run-length-compressed when the firmware advertises
+  it (`encodings` header of `GET /`) and it is smaller; `--raw` disables this.
+* Packed images are cached in `output/cache/assets/` by file contents and
+  target, so re-sending the same image skips decoding; `--no-cache` disables.
+* `batch [manifest]` —— draw many images (JSON lines: file, x, y, w, h, package;
+  stdin by default) over one connection and one device probe.
+* `watch DIR` —— push images in DIR whenever they change.
 """
 from __future__ import annotations
 
 import argparse
+import json
+import math
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import NamedTuple
+from typing import Callable, Iterable, Iterator, NamedTuple
 
 import requests
 from PIL import Image, ImageOps
 
+import asset_cache
+import metrics
+from profiling import profiled
+
 # ───────────────────────── HTTP helpers ──────────────────────────
 
 
-def http_get(host: str, path: str = "", timeout: int = 5) -> requests.Response:
-    r = requests.get(f"http://{host}{path}", timeout=timeout)
+def http_get(
+    host: str, path: str = "", timeout: int = 5, session: requests.Session | None = None
+) -> requests.Response:
+    r = (session or requests).get(f"http://{host}{path}", timeout=timeout)
     r.raise_for_status()
     return r
 
 
-def http_post(host: str, path: str, **kw) -> requests.Response:
-    r = requests.post(f"http://{host}{path}", timeout=5, **kw)
+def http_post(
+    host: str, path: str, session: requests.Session | None = None, **kw
+) -> requests.Response:
+    r = (session or requests).post(f"http://{host}{path}", timeout=5, **kw)
     r.raise_for_status()
     return r
 
@@ -42,11 +66,13 @@ class EpdInfo(NamedTuple):
     width: int
     height: int
     temperature: int
+    encodings: frozenset[str] = frozenset()  # /draw body encodings besides raw
 
     @classmethod
     def from_response(cls, r: requests.Response) -> "EpdInfo":
         h = r.headers
-        return cls(int(h["width"]), int(h["height"]), int(h["temperature"]))
+        encodings = frozenset(e.strip() for e in h.get("encodings", "").split(",") if e.strip())
+        return cls(int(h["width"]), int(h["height"]), int(h["temperature"]), encodings)
 
 
 class Dim(NamedTuple):
@@ -77,7 +103,22 @@ def pack_4bit(buf: bytes) -> bytes:
     return bytes(out)
 
 
+# byte -> high/low pixel lookup tables for unpack_4bit
+_HI = bytes((b >> 4) * 17 for b in range(256))
+_LO = bytes((b & 0x0F) * 17 for b in range(256))
+
+
+def unpack_4bit(buf: bytes) -> bytearray:
+    """Inverse of pack_4bit: two 4-bit pixels per byte back to 8-bit gray."""
+    out = bytearray(len(buf) * 2)
+    out[0::2] = buf.translate(_HI)
+    out[1::2] = buf.translate(_LO)
+    return out
+
+
 def pack_1bit(buf: bytes, thresh: int = 128) -> bytes:
+    if len(buf) % 8:
+        buf = bytes(buf) + b"\xff" * (8 - len(buf) % 8)  # white up to the last byte
     out = bytearray(len(buf) // 8)
     for i in range(0, len(buf), 8):
         b = 0
@@ -87,39 +128,69 @@ def pack_1bit(buf: bytes, thresh: int = 128) -> bytes:
     return bytes(out)
 
 
-# ───────────────────────── upload routine ────────────────────────
+# ─────────────────────── payload compression ─────────────────────
 
+# Firmware that can decode compressed /draw bodies lists them in the
+# ``encodings`` header of ``GET /`` (e.g. ``zlib,rle``); a draw then names
+# its body's encoding in an ``encoding`` header. Without it the body is raw.
 
-def draw_image(
-    host: str,
-    path: Path,
-    *,
-    bw: bool,
-    package: str,
-    clear: bool,
-    preview: bool,
-    x: int,
-    y: int,
-    w: int | None,
-    h: int | None,
-    max_usage: float,
-) -> None:
-    info = EpdInfo.from_response(http_get(host))
-    free = int(http_get(host, "/free").text.strip())
-    # print(f"Free PSRAM: {free} B")
-    # x, y = y, x
+_RUN = re.compile(rb"(.)\1{2,}", re.S)
 
-    w = w or (info.width - x)
-    h = h or (info.height - y)
-    if x + w > info.width or y + h > info.height:
-        raise ValueError("ROI out of bounds")
 
-    img = Image.open(path).convert("L")
-    img = image_refit(img, Dim(w, h))
+def rle_encode(buf: bytes) -> bytes:
+    """PackBits: header n < 128 → n+1 literal bytes follow,
+    n > 128 → the next byte repeated 257-n times."""
+    out = bytearray()
+
+    def literal(chunk: bytes) -> None:
+        for i in range(0, len(chunk), 128):
+            part = chunk[i : i + 128]
+            out.append(len(part) - 1)
+            out.extend(part)
 
-    # choose packing
+    pos = 0
+    for m in _RUN.finditer(buf):
+        literal(buf[pos : m.start()])
+        value, n = m.group(1), m.end() - m.start()
+        while n >= 3:
+            k = min(n, 128)
+            out.append(257 - k)
+            out += value
+            n -= k
+        literal(value * n)
+        pos = m.end()
+    literal(buf[pos:])
+    return bytes(out)
+
+
+# level 1 is ~4x faster than 6 for a few % more bytes
+ENCODERS = {"zlib": lambda buf: zlib.compress(buf, 1), "rle": rle_encode}
+
+
+def compress(payload: bytes, encodings: Iterable[str]) -> tuple[str, bytes]:
+    """The payload in the smallest encoding the device takes (raw included)."""
+    best = ("raw", payload)
+    for name, encode in ENCODERS.items():
+        if name in encodings:
+            body = encode(payload)
+            if len(body) < len(best[1]):
+                best = (name, body)
+    return best
+
+
+# ───────────────────────── upload routine ────────────────────────
+
+
+def probe(host: str, session: requests.Session | None = None) -> tuple[EpdInfo, int]:
+    """Panel geometry and free PSRAM (bytes), one round trip each."""
+    info = EpdInfo.from_response(http_get(host, session=session))
+    free = int(http_get(host, "/free", session=session).text.strip())
+    return info, free
+
+
+def packing(bw: bool, package: str):
+    """Return (encode, bytes-per-pixel) for a bw/package combination."""
     if bw:
-        img = dither_to_bw(img)
         encode = pack_1bit if package == "8ppB" else pack_4bit
         bpp = 0.125 if package == "8ppB" else 0.5
     else:
@@ -127,25 +198,143 @@ def draw_image(
             raise ValueError("Package must be 2ppB when not in BW mode")
         encode = pack_4bit
         bpp = 0.5
+    return encode, bpp
 
-    if preview:
-        print(f"Previewing {package} image {img.size} @ {x},{y}")
-        img.show()
 
+def patch_height(free: int, w: int, h: int, bpp: float, max_usage: float) -> int:
+    """Tallest even patch of width ``w`` that fits ``max_usage`` of free PSRAM.
+
+    At 1 bit per pixel the patch also starts on a whole byte.
+    """
     usable = int(free * max_usage)
     max_pix = int(usable / bpp)
-    patch_h = min(max(max_pix // w, 2), h)
-    if patch_h % 2:
-        patch_h -= 1
+    step = 2
+    if bpp < 0.5:
+        step = math.lcm(2, 8 // math.gcd(w, 8))
+    patch_h = min(max(max_pix // w, step), h)
+    if patch_h < h or patch_h % 2:
+        patch_h -= patch_h % step
     if patch_h < 2:
         raise RuntimeError("ROI too wide for PSRAM")
+    return patch_h
+
+
+class Payload(NamedTuple):
+    """An image packed for /draw."""
+
+    width: int
+    height: int
+    data: bytes
+
+
+def prepare_payload(
+    path: Path, w: int, h: int, *, bw: bool, package: str, cache: bool = True
+) -> Payload:
+    """Decode, fit, dither and pack an image file for a w×h ROI.
+
+    With ``cache`` the packed result is kept in ``asset_cache`` and later
+    calls for the same file contents and target skip all of it.
+    """
+    encode, _ = packing(bw, package)
+    key = asset_cache.payload_key(path, w, h, bw, package) if cache else None
+    if key is not None:
+        data = asset_cache.load(key)
+        if data is not None:
+            return Payload(w, h, data)
+    with Image.open(path) as src:
+        img = src.convert("L")
+    if img.size != (w, h):
+        img = image_refit(img, Dim(w, h))
+    if bw:
+        img = dither_to_bw(img)
+    with metrics.span("encode"):
+        data = encode(img.tobytes())
+    if key is not None:
+        asset_cache.store(key, data)
+    return Payload(w, h, data)
+
+
+def upload_image(
+    host: str,
+    img: Image.Image,
+    *,
+    x: int,
+    y: int,
+    bw: bool,
+    package: str,
+    clear: bool,
+    max_usage: float,
+    info: EpdInfo | None = None,
+    free: int | None = None,
+    session: requests.Session | None = None,
+    compressed: bool = True,
+) -> int:
+    """Upload an ``L`` image that already has its final size at (x, y).
+
+    ``info``/``free`` from an earlier ``probe`` skip the two probe requests,
+    so several regions can share one probe. With ``compressed`` each patch
+    is sent in the smallest encoding the device supports. Returns the
+    number of patches.
+    """
+    if bw:
+        img = dither_to_bw(img)
+    encode, _ = packing(bw, package)
+    with metrics.span("encode"):
+        data = encode(img.tobytes())
+    return upload_payload(
+        host,
+        Payload(img.width, img.height, data),
+        x=x,
+        y=y,
+        bw=bw,
+        package=package,
+        clear=clear,
+        max_usage=max_usage,
+        info=info,
+        free=free,
+        session=session,
+        compressed=compressed,
+    )
+
+
+def upload_payload(
+    host: str,
+    payload: Payload,
+    *,
+    x: int,
+    y: int,
+    bw: bool,
+    package: str,
+    clear: bool,
+    max_usage: float,
+    info: EpdInfo | None = None,
+    free: int | None = None,
+    session: requests.Session | None = None,
+    compressed: bool = True,
+) -> int:
+    """Upload an already packed image at (x, y) in PSRAM-sized patches."""
+    if info is None or free is None:
+        info, free = probe(host, session)
+    w, h, packed = payload
+    if x + w > info.width or y + h > info.height:
+        raise ValueError("ROI out of bounds")
+    _, bpp = packing(bw, package)
+    patch_h = patch_height(free, w, h, bpp, max_usage)
 
     # print(f"Uploading {'BW' if bw else 'GRAY'} {package} in {patch_h}-row patches…")
 
+    n = 0
     for y_off in range(0, h, patch_h):
         ph = min(patch_h, h - y_off)
-        patch = img.crop((0, y_off, w, y_off + ph))
-        payload = encode(patch.tobytes())
+        start = int(y_off * w * bpp)
+        raw = packed[start : int((y_off + ph) * w * bpp) if y_off + ph < h else None]
+        encoding, body = "raw", raw
+        if compressed and info.encodings:
+            with metrics.span("encode"):
+                encoding, body = compress(raw, info.encodings)
+            # the device holds the body and the decoded patch at once
+            if len(body) + len(raw) > free:
+                encoding, body = "raw", raw
         hdr = {
             "width": str(w),
             "height": str(ph),
@@ -154,9 +343,272 @@ def draw_image(
             "clear": "1" if clear and y_off == 0 else "0",
             "bw": "1" if package == "8ppB" else "0",
         }
-        http_post(host, "/draw", headers=hdr, data=payload)
+        if encoding != "raw":
+            hdr["encoding"] = encoding
+        with metrics.span("draw") as s:
+            http_post(host, "/draw", session, headers=hdr, data=body)
+            s.bytes, s.patches = len(body), 1
+        metrics.DRAW_PATCHES.inc(encoding=encoding)
+        metrics.DRAW_BYTES_SAVED.inc(len(raw) - len(body), encoding=encoding)
+        n += 1
         # print(f"patch {y + y_off}->{y + y_off + ph} OK")
     # print("Done")
+    return n
+
+
+@profiled("draw_image")
+def draw_image(
+    host: str,
+    path: Path,
+    *,
+    bw: bool,
+    package: str,
+    clear: bool,
+    preview: bool,
+    x: int,
+    y: int,
+    w: int | None,
+    h: int | None,
+    max_usage: float,
+    compressed: bool = True,
+    cache: bool = True,
+) -> None:
+    info, free = probe(host)
+    # print(f"Free PSRAM: {free} B")
+    # x, y = y, x
+
+    w = w or (info.width - x)
+    h = h or (info.height - y)
+    if x + w > info.width or y + h > info.height:
+        raise ValueError("ROI out of bounds")
+    packing(bw, package)  # reject bad combinations before decoding
+
+    if preview:
+        img = image_refit(Image.open(path).convert("L"), Dim(w, h))
+        print(f"Previewing {package} image {img.size} @ {x},{y}")
+        (dither_to_bw(img) if bw else img).show()
+
+    upload_payload(
+        host,
+        prepare_payload(path, w, h, bw=bw, package=package, cache=cache),
+        x=x,
+        y=y,
+        bw=bw,
+        package=package,
+        clear=clear,
+        max_usage=max_usage,
+        info=info,
+        free=free,
+        compressed=compressed,
+    )
+
+
+# ──────────────────────── batch / watch ──────────────────────────
+
+
+class DrawJob(NamedTuple):
+    file: Path
+    x: int = 0
+    y: int = 0
+    w: int | None = None
+    h: int | None = None
+    package: str = "2ppB"
+    bw: bool = False
+    clear: bool = False
+
+    @classmethod
+    def from_json(cls, line: str, base: Path = Path(".")) -> "DrawJob":
+        """One manifest line, e.g. ``{"file": "a.png", "x": 0, "y": 0, "package": "8ppB"}``.
+
+        ``file`` is relative to ``base``; ``8ppB`` implies ``bw``.
+        """
+        d = json.loads(line)
+        package = d.get("package", "2ppB")
+        return cls(
+            base / d["file"],
+            int(d.get("x", 0)),
+            int(d.get("y", 0)),
+            d.get("w"),
+            d.get("h"),
+            package,
+            bool(d.get("bw", package == "8ppB")),
+            bool(d.get("clear", False)),
+        )
+
+
+def read_manifest(lines: Iterable[str], base: Path = Path(".")) -> Iterator[DrawJob]:
+    """Jobs from JSON lines; blank lines and ``#`` comments are skipped."""
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield DrawJob.from_json(line, base)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[!] manifest line {n}: {e}")
+
+
+class EpdSession:
+    """Many draws over one keep-alive connection and one device probe.
+
+    Images are decoded, refit, dithered and packed (or taken from the asset
+    cache) on a worker thread while the previous job uploads, so encoding
+    overlaps with the Wi-Fi transfer.
+    """
+
+    def __init__(
+        self, host: str, max_usage: float = 0.8, compressed: bool = True, cache: bool = True
+    ):
+        self.host = host
+        self.max_usage = max_usage
+        self.compressed = compressed
+        self.cache = cache
+        self.http = requests.Session()
+        self.info: EpdInfo | None = None
+        self.free: int | None = None
+        self.drawn = 0
+        self.failed = 0
+
+    def __enter__(self) -> "EpdSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.http.close()
+
+    def probe(self) -> EpdInfo:
+        if self.info is None or self.free is None:
+            self.info, self.free = probe(self.host, self.http)
+        return self.info
+
+    def prepare(self, job: DrawJob, info: EpdInfo) -> Payload:
+        """A job's image packed for its ROI."""
+        w = job.w or (info.width - job.x)
+        h = job.h or (info.height - job.y)
+        if job.x + w > info.width or job.y + h > info.height:
+            raise ValueError("ROI out of bounds")
+        return prepare_payload(
+            job.file, w, h, bw=job.bw, package=job.package, cache=self.cache
+        )
+
+    def send(self, job: DrawJob, payload: Payload) -> int:
+        return upload_payload(
+            self.host,
+            payload,
+            x=job.x,
+            y=job.y,
+            bw=job.bw,
+            package=job.package,
+            clear=job.clear,
+            max_usage=self.max_usage,
+            info=self.info,
+            free=self.free,
+            session=self.http,
+            compressed=self.compressed,
+        )
+
+    def run(
+        self, jobs: Iterable[DrawJob], on_drawn: Callable[[DrawJob], None] | None = None
+    ) -> int:
+        """Draw jobs in order, preparing the next one during each upload.
+
+        A failing job is reported and skipped; ``on_drawn`` is called for
+        each job that reached the panel. Returns the number drawn.
+        """
+        # the device is probed here only, never on the encode thread
+        try:
+            info = self.probe()
+        except Exception as e:
+            print(f"[!] {self.host}: {e}")
+            return self.drawn
+        with ThreadPoolExecutor(1, thread_name_prefix="encode") as pool:
+            it = iter(jobs)
+            nxt = next(it, None)
+            pending = pool.submit(self.prepare, nxt, info) if nxt is not None else None
+            while pending is not None:
+                job = nxt
+                nxt = next(it, None)
+                try:
+                    payload = pending.result()
+                except Exception as e:
+                    payload = None
+                    self.failed += 1
+                    print(f"[!] {job.file}: {e}")
+                pending = pool.submit(self.prepare, nxt, info) if nxt is not None else None
+                if payload is None:
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    self.probe()  # again after a failed send
+                    patches = self.send(job, payload)
+                except Exception as e:
+                    self.failed += 1
+                    self.info = self.free = None  # re-probe before the next job
+                    print(f"[!] {job.file}: {e}")
+                    continue
+                self.drawn += 1
+                if on_drawn is not None:
+                    on_drawn(job)
+                print(
+                    f"[{datetime.now():%H:%M:%S}] {job.file} → {job.x},{job.y} "
+                    f"{payload.width}x{payload.height} {job.package}, {patches} patch(es), "
+                    f"{(time.perf_counter() - t0) * 1000:.0f} ms"
+                )
+        return self.drawn
+
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
+
+
+def watch(
+    session: EpdSession,
+    directory: Path,
+    placements: dict[str, DrawJob],
+    default: DrawJob,
+    interval: float = 1.0,
+    initial: bool = False,
+) -> None:
+    """Push images in ``directory`` whenever they change, until Ctrl-C.
+
+    Files listed in ``placements`` (by name) use that job, others use
+    ``default``. A file is sent once its size and mtime are unchanged for
+    one poll, so half-written files are not picked up.
+    """
+
+    def scan() -> dict[Path, tuple[int, int]]:
+        found = {}
+        for path in directory.iterdir():
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                found[path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def mark_sent(job: DrawJob) -> None:
+        sent[job.file] = current[job.file]
+
+    sent = {} if initial else scan()
+    seen = dict(sent)
+    print(f"[{datetime.now():%H:%M:%S}] Watching {directory} (Ctrl-C to stop)")
+    try:
+        while True:
+            current = scan()
+            ready = sorted(
+                path
+                for path, sig in current.items()
+                if sig == seen.get(path) and sent.get(path) != sig
+            )
+            if ready:
+                # only what reached the panel; failed files are retried next poll
+                session.run(
+                    (placements.get(p.name, default)._replace(file=p) for p in ready),
+                    on_drawn=mark_sent,
+                )
+            seen = current
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
 
 
 # ─────────────────────────── CLI ─────────────────────────────────
@@ -186,6 +638,34 @@ def cli() -> argparse.Namespace:
     d.add_argument("-c", "--clear", action="store_true")
     d.add_argument("--preview", action="store_true")
     d.add_argument("--max-usage", type=float, default=0.8)
+    d.add_argument("--raw", action="store_true", help="never compress /draw bodies")
+    d.add_argument("--no-cache", action="store_true", help="don't use the asset cache")
+
+    b = sub.add_parser("batch", help="draw many images over one session")
+    b.add_argument(
+        "manifest",
+        nargs="?",
+        default="-",
+        help='JSON lines {"file", "x", "y", "w", "h", "package"}; "-" = stdin',
+    )
+    b.add_argument("--max-usage", type=float, default=0.8)
+    b.add_argument("--raw", action="store_true", help="never compress /draw bodies")
+    b.add_argument("--no-cache", action="store_true", help="don't use the asset cache")
+
+    w = sub.add_parser("watch", help="push images in a directory when they change")
+    w.add_argument("directory", type=Path)
+    w.add_argument("--manifest", type=Path, help="placement per file name (JSON lines)")
+    w.add_argument("--bw", action="store_true", help="monochrome for unlisted files")
+    w.add_argument("--package", choices=["2ppB", "8ppB"], default="2ppB")
+    w.add_argument("--x", type=int, default=0)
+    w.add_argument("--y", type=int, default=0)
+    w.add_argument("--width", type=int)
+    w.add_argument("--height", type=int)
+    w.add_argument("--interval", type=float, default=1.0, help="poll interval, s")
+    w.add_argument("--initial", action="store_true", help="push existing files first")
+    w.add_argument("--max-usage", type=float, default=0.8)
+    w.add_argument("--raw", action="store_true", help="never compress /draw bodies")
+    w.add_argument("--no-cache", action="store_true", help="don't use the asset cache")
     return p.parse_args()
 
 
@@ -203,6 +683,27 @@ def main() -> None:
     if a.cmd == "free":
         print(http_get(a.hostname, "/free").text.strip())
         return
+    if a.cmd == "batch":
+        if a.manifest == "-":
+            jobs = read_manifest(sys.stdin)
+        else:
+            path = Path(a.manifest)
+            jobs = read_manifest(path.read_text().splitlines(), path.parent)
+        with EpdSession(a.hostname, a.max_usage, not a.raw, not a.no_cache) as session:
+            session.run(jobs)
+        print(f"{session.drawn} drawn, {session.failed} failed")
+        sys.exit(1 if session.failed else 0)
+    if a.cmd == "watch":
+        placements = {}
+        if a.manifest:
+            for job in read_manifest(a.manifest.read_text().splitlines(), a.directory):
+                placements[job.file.name] = job
+        default = DrawJob(
+            a.directory, a.x, a.y, a.width, a.height, a.package, a.bw or a.package == "8ppB"
+        )
+        with EpdSession(a.hostname, a.max_usage, not a.raw, not a.no_cache) as session:
+            watch(session, a.directory, placements, default, a.interval, a.initial)
+        return
 
     draw_image(
         a.hostname,
@@ -216,6 +717,8 @@ def main() -> None:
         w=a.width,
         h=a.height,
         max_usage=a.max_usage,
+        compressed=not a.raw,
+        cache=not a.no_cache,
     )
 
 
@@ -0,0 +1,61 @@
+"""Deferred imports and a startup timing report.
+
+Heavy libraries (matplotlib, cairosvg, homeassistant_api, ...) are
+imported through ``lazy_import`` at the point of first use, so a config
+without chart components never pays for them. Every first import and every
+``mark``-ed phase is timed relative to process start and can be printed
+with ``report`` – a coarse, always-on version of ``python -X importtime``.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+import time
+from datetime import datetime
+from types import ModuleType
+
+_T0 = time.perf_counter()
+_lock = threading.Lock()
+
+# module name -> seconds spent in its first import
+IMPORT_TIMES: dict[str, float] = {}
+# (phase, seconds since start), in order
+PHASES: list[tuple[str, float]] = []
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import ``name`` on first use and record how long it took."""
+    # always go through import_module: a module another thread is still
+    # importing is already in sys.modules, half-initialised; the import
+    # system's per-module lock makes us wait for it to finish
+    first = name not in sys.modules
+    t = time.perf_counter()
+    mod = importlib.import_module(name)
+    if first:
+        with _lock:
+            IMPORT_TIMES.setdefault(name, time.perf_counter() - t)
+    return mod
+
+
+def elapsed() -> float:
+    """Seconds since this module was first imported."""
+    return time.perf_counter() - _T0
+
+
+def mark(phase: str) -> None:
+    """Record that ``phase`` finished now."""
+    with _lock:
+        PHASES.append((phase, elapsed()))
+
+
+def report() -> None:
+    """Print startup phases and deferred imports, slowest imports first."""
+    print(f"[{datetime.now():%H:%M:%S}] Startup report:")
+    for phase, t in PHASES:
+        print(f"    {t * 1000:8.0f} ms  {phase}")
+    if IMPORT_TIMES:
+        print("    deferred imports:")
+        for name, t in sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1]):
+            print(f"    {t * 1000:8.0f} ms  {name}")
@@ -1,23 +1,58 @@
 import requests
-import json
-from datetime import datetime
+import json, os, time
+from datetime import datetime, timedelta
+from pathlib import Path
 from const import *
 from zoneinfo import ZoneInfo
 
+# Forecasts are cached on disk per (lat, lon, date, type). A cached forecast
+# younger than the TTL is used as is; an older one is refreshed, but still
+# served when the API fails.
+CACHE_PATH = Path("output/cache/sunsethue.json")
+CACHE_TTL = 3 * 3600  # s
+TIMEOUT = 10  # s
+FALLBACK_EVENT_TIME = "21:00"  # when the forecast has no event time
 
-def get_weather_forecast():
+
+def _today() -> datetime:
+    return datetime.now(ZoneInfo(TIMEZONE))
+
+
+def _cache_key(date: str, event_type: str) -> str:
+    return f"{SUNSETHUE_LATITUDE},{SUNSETHUE_LONGITUDE},{date},{event_type}"
+
+
+def _load_cache() -> dict:
+    try:
+        return json.loads(CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict) -> None:
+    # keep yesterday onwards only
+    oldest = (_today() - timedelta(days=1)).strftime("%Y-%m-%d")
+    cache = {k: v for k, v in cache.items() if k.split(",")[2] >= oldest}
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache))
+    os.replace(tmp, CACHE_PATH)
+
+
+def fetch_forecast(date: str, event_type: str = "sunset", timeout: float = TIMEOUT):
+    """One request to the API; returns the parsed response or None."""
     base_url = "https://api.sunsethue.com/event"
 
     params = {
         "key": SUNSETHUE_API_KEY,
         "latitude": SUNSETHUE_LATITUDE,
         "longitude": SUNSETHUE_LONGITUDE,
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "type": "sunset",
+        "date": date,
+        "type": event_type,
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        response = requests.get(base_url, params=params, timeout=timeout)
         response.raise_for_status()
         return response.json()
 
@@ -35,13 +70,83 @@ def get_weather_forecast():
     return None
 
 
+def get_weather_forecast(
+    date: str | None = None,
+    event_type: str = "sunset",
+    ttl: float = CACHE_TTL,
+    timeout: float = TIMEOUT,
+):
+    """Forecast for ``date`` (default today), from the cache when fresh."""
+    date = date or _today().strftime("%Y-%m-%d")
+    key = _cache_key(date, event_type)
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry and time.time() - entry["fetched"] < ttl:
+        return entry["data"]
+
+    data = fetch_forecast(date, event_type, timeout)
+    if data and "data" in data:
+        cache[key] = {"fetched": time.time(), "data": data}
+        try:
+            _save_cache(cache)
+        except OSError as e:
+            print(f"[!] Couldn't write the forecast cache: {e}")
+        return data
+    if entry:
+        fetched = datetime.fromtimestamp(entry["fetched"])
+        print(f"[!] Sunsethue unavailable, using the {date} forecast from {fetched:%m-%d %H:%M}")
+        return entry["data"]
+    return None
+
+
+def event_time(data) -> datetime | None:
+    """When the forecast event (e.g. the sunset) happens, if the data says."""
+    try:
+        forecast = data["data"]
+        stamp = forecast.get("time") or forecast["magics"]["blue_hour"][-1]
+        return datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    except (TypeError, KeyError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def switch_time(data, fallback: str = FALLBACK_EVENT_TIME) -> datetime:
+    """When today's forecast is over: its event, else ``fallback`` ("HH:MM") today."""
+    when = event_time(data)
+    if when is not None:
+        return when
+    hour, minute = (int(v) for v in fallback.split(":"))
+    return _today().replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def current_forecast(
+    event_type: str = "sunset",
+    ttl: float = CACHE_TTL,
+    timeout: float = TIMEOUT,
+    fallback: str = FALLBACK_EVENT_TIME,
+):
+    """``(date, data)`` of the forecast worth showing now.
+
+    Today's until ``switch_time``, then tomorrow's. Callers refresh at
+    ``switch_time`` so tomorrow's forecast is fetched right after sunset.
+    """
+    now = _today()
+    today = now.strftime("%Y-%m-%d")
+    data = get_weather_forecast(today, event_type, ttl, timeout)
+    if now > switch_time(data, fallback):
+        tomorrow = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+        upcoming = get_weather_forecast(tomorrow, event_type, ttl, timeout)
+        if upcoming:
+            return tomorrow, upcoming
+    return today, data
+
+
 def format_forecast_data(data):
     if not data:
-        return "No data available."
+        return None
 
     # Check if 'data' key exists
     if "data" not in data:
-        return "Invalid data format."
+        return None
 
     forecast_data = data["data"]
 